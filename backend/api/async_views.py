@@ -0,0 +1,235 @@
+"""
+Асинхронные обработчики GET-запросов для самых нагруженных
+анонимных эндпоинтов. Используют асинхронный ORM Django и
+подключаются при ASYNC_READ_VIEWS = True (ASGI-развёртывание).
+Остальные методы передаются синхронным DRF-представлениям.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db.models import Exists, OuterRef, Value
+from django.http import Http404, HttpResponseNotAllowed, JsonResponse
+from django.shortcuts import redirect
+from django.utils.translation import gettext as _
+
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from users.models import Subscription
+
+from .authentication import token_user_cache
+from .catalog import ingredients_snapshot, snapshot_response, tags_snapshot
+from .conditional import (catalog_version, make_etag, not_modified,
+                          recipe_versions, set_validators)
+from .filters import search_by_name
+from .search import ingredient_index
+from .serializers import (IngredientInRecipeSerializer, RecipeSerializer,
+                          TagSerializer)
+from .short_links import short_link_resolver
+from .views import IngredientViewSet, RecipeViewSet, TagViewSet
+
+JSON_DUMPS_PARAMS = {'ensure_ascii': False, 'separators': (',', ':')}
+
+
+class RecipeDetailSerializer(RecipeSerializer):
+    """
+    RecipeSerializer для рецепта, связи которого загружены заранее:
+    теги и ингредиенты берутся из атрибутов, а не из менеджеров.
+    """
+    tags = TagSerializer(many=True, read_only=True, source='loaded_tags')
+    ingredients = IngredientInRecipeSerializer(
+        many=True, read_only=True, source='loaded_ingredients'
+    )
+
+
+class AuthenticationFailed(Exception):
+    pass
+
+
+def json_response(data, status=200):
+    return JsonResponse(
+        data, status=status, safe=False, json_dumps_params=JSON_DUMPS_PARAMS
+    )
+
+
+def not_found(model):
+    """Тот же ответ, что и у get_object_or_404 в DRF."""
+    return json_response(
+        {'detail': f'No {model._meta.object_name} matches the given query.'},
+        status=404
+    )
+
+
+async def aauthenticate(request):
+    """Асинхронный аналог CachedTokenAuthentication."""
+    header = request.headers.get('Authorization', '').split()
+    if not header or header[0].lower() != 'token':
+        return AnonymousUser()
+    if len(header) != 2:
+        raise AuthenticationFailed(
+            _('Invalid token header. No credentials provided.')
+        )
+    user = await token_user_cache.aget_user(header[1])
+    if user is None:
+        raise AuthenticationFailed(_('Invalid token.'))
+    if not user.is_active:
+        raise AuthenticationFailed(_('User inactive or deleted.'))
+    return user
+
+
+async def catalog_response(request, build):
+    """Условный ответ справочника; build строит тело ответа."""
+    version = await sync_to_async(catalog_version)()
+    etag = make_etag('json', request.get_full_path(), version)
+    response = not_modified(request, etag, version, vary=())
+    if response is None:
+        response = await build()
+        if response.status_code == 200:
+            set_validators(response, etag, version, vary=())
+    return response
+
+
+def read_only(sync_view):
+    """
+    GET и HEAD обрабатывает асинхронное представление,
+    остальные методы - синхронное DRF-представление sync_view.
+    """
+    sync_view = sync_to_async(sync_view)
+
+    def decorator(async_view):
+        @wraps(async_view)
+        async def view(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return await sync_view(request, *args, **kwargs)
+            try:
+                request.user = await aauthenticate(request)
+            except AuthenticationFailed as error:
+                response = json_response({'detail': str(error)}, status=401)
+                response['WWW-Authenticate'] = 'Token'
+                return response
+            return await async_view(request, *args, **kwargs)
+
+        view.csrf_exempt = True
+        return view
+    return decorator
+
+
+@read_only(TagViewSet.as_view({'get': 'list'}))
+async def tag_list(request):
+    return snapshot_response(
+        request, await sync_to_async(tags_snapshot.get)()
+    )
+
+
+@read_only(TagViewSet.as_view({'get': 'retrieve'}))
+async def tag_detail(request, pk):
+    async def build():
+        tag = await Tag.objects.values('id', 'name', 'slug').filter(
+            pk=pk
+        ).afirst()
+        return not_found(Tag) if tag is None else json_response(tag)
+    return await catalog_response(request, build)
+
+
+@read_only(IngredientViewSet.as_view({'get': 'list'}))
+async def ingredient_list(request):
+    name = request.GET.get('name')
+    if not name:
+        return snapshot_response(
+            request, await sync_to_async(ingredients_snapshot.get)()
+        )
+
+    async def build():
+        if settings.INGREDIENT_SEARCH_BACKEND == 'memory':
+            return json_response(
+                await sync_to_async(ingredient_index.search)(name)
+            )
+        return json_response([
+            ingredient async for ingredient
+            in search_by_name(Ingredient.objects.all(), name).values(
+                'id', 'name', 'measurement_unit'
+            )
+        ])
+    return await catalog_response(request, build)
+
+
+@read_only(IngredientViewSet.as_view({'get': 'retrieve'}))
+async def ingredient_detail(request, pk):
+    async def build():
+        ingredient = await Ingredient.objects.values(
+            'id', 'name', 'measurement_unit'
+        ).filter(pk=pk).afirst()
+        if ingredient is None:
+            return not_found(Ingredient)
+        return json_response(ingredient)
+    return await catalog_response(request, build)
+
+
+@read_only(RecipeViewSet.as_view({
+    'get': 'retrieve',
+    'put': 'update',
+    'patch': 'partial_update',
+    'delete': 'destroy',
+}))
+async def recipe_detail(request, pk):
+    user = request.user
+    recipes = Recipe.objects.select_related('author')
+    if user.is_authenticated:
+        recipes = recipes.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            is_subscribed=Exists(Subscription.objects.filter(
+                user=user, author=OuterRef('author')
+            )),
+        )
+    else:
+        recipes = recipes.annotate(
+            is_favorited=Value(False),
+            is_in_shopping_cart=Value(False),
+            is_subscribed=Value(False),
+        )
+    version = await recipe_versions(recipes.filter(pk=pk), user).afirst()
+    if version is None:
+        return not_found(Recipe)
+    etag = make_etag(
+        'json',
+        user.pk,
+        await sync_to_async(catalog_version)(),
+        tuple(version.values()),
+    )
+    response = not_modified(request, etag)
+    if response is not None:
+        return response
+
+    recipe = await recipes.filter(pk=pk).afirst()
+    if recipe is None:
+        return not_found(Recipe)
+    recipe.author.is_subscribed = recipe.is_subscribed
+    recipe.loaded_tags = [tag async for tag in Tag.objects.filter(recipes=pk)]
+    recipe.loaded_ingredients = [
+        recipe_ingredient async for recipe_ingredient
+        in RecipeIngredient.objects.filter(
+            recipe=pk
+        ).select_related('ingredient')
+    ]
+    return set_validators(
+        json_response(
+            RecipeDetailSerializer(recipe, context={'request': request}).data
+        ),
+        etag
+    )
+
+
+async def redirect_short_link(request, short_link):
+    """Переадресовывает на оригинальный рецепт."""
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    recipe_id = await short_link_resolver.aresolve(short_link)
+    if recipe_id is None:
+        raise Http404('Рецепт не найден.')
+    return redirect(f'/recipes/{recipe_id}')
@@ -0,0 +1,151 @@
+"""
+Аутентификация по токену с кешированием пользователя.
+
+Выход и смена пароля сбрасывают кеш только в текущем процессе и в общем
+кеше. Другой процесс может принимать токен из своего кеша в памяти ещё
+до TOKEN_CACHE_TTL секунд: это плата за запрос к БД на каждый запрос.
+При TOKEN_SHARED_CACHE и TOKEN_LOCAL_CACHE = False кеш в памяти
+не используется, и сброс виден всем процессам сразу.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from .cache import LRUCache
+from .constants import (TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL,
+                        TOKEN_SHARED_CACHE_TIMEOUT)
+
+User = get_user_model()
+
+
+class TokenUserCache:
+    """
+    Токен -> пользователь.
+    Первый уровень - LRU в памяти процесса с коротким TTL,
+    второй (по TOKEN_SHARED_CACHE) - общий кеш Django.
+    В кеше хранятся только значения user_fields, а не пользователь
+    целиком: хеш пароля и личные данные в общий кеш не попадают.
+    Каждому запросу отдаётся свой облегчённый пользователь; остальные
+    поля отложены и при обращении загружаются из БД. Он может быть
+    устаревшим, поэтому записывать его в БД нельзя.
+    """
+    key_prefix = 'auth_token_user:'
+    user_fields = ('id', 'is_active', 'is_staff', 'is_superuser')
+
+    def __init__(self, maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL):
+        self.local = LRUCache(maxsize, ttl)
+        self.shared_hits = 0
+        self.shared_misses = 0
+
+    @property
+    def shared(self):
+        return cache if settings.TOKEN_SHARED_CACHE else None
+
+    def _get_local(self, key):
+        return self.local.get(key) if settings.TOKEN_LOCAL_CACHE else None
+
+    def _set_local(self, key, values):
+        if settings.TOKEN_LOCAL_CACHE:
+            self.local.set(key, values)
+
+    def _count_shared(self, values):
+        if values is None:
+            self.shared_misses += 1
+        else:
+            self.shared_hits += 1
+
+    def _query(self, key):
+        return Token.objects.filter(key=key).values_list(
+            *(f'user__{field}' for field in self.user_fields)
+        )
+
+    def _build(self, values):
+        # from_db ждёт значения в порядке полей модели
+        stored = dict(zip(self.user_fields, values))
+        fields = [
+            field.attname for field in User._meta.concrete_fields
+            if field.attname in stored
+        ]
+        return User.from_db(
+            None, fields, [stored[field] for field in fields]
+        )
+
+    def get_user(self, key):
+        """Пользователь по ключу токена или None."""
+        values = self._get_local(key)
+        if values is None:
+            shared = self.shared
+            if shared is not None:
+                values = shared.get(self.key_prefix + key)
+                self._count_shared(values)
+            if values is None:
+                values = self._query(key).first()
+                if values is None:
+                    return None
+                if shared is not None:
+                    shared.set(
+                        self.key_prefix + key, values,
+                        TOKEN_SHARED_CACHE_TIMEOUT
+                    )
+            self._set_local(key, values)
+        return self._build(values)
+
+    async def aget_user(self, key):
+        """Асинхронный вариант get_user."""
+        values = self._get_local(key)
+        if values is None:
+            shared = self.shared
+            if shared is not None:
+                values = await shared.aget(self.key_prefix + key)
+                self._count_shared(values)
+            if values is None:
+                values = await self._query(key).afirst()
+                if values is None:
+                    return None
+                if shared is not None:
+                    await shared.aset(
+                        self.key_prefix + key, values,
+                        TOKEN_SHARED_CACHE_TIMEOUT
+                    )
+            self._set_local(key, values)
+        return self._build(values)
+
+    def invalidate(self, key):
+        self.local.delete(key)
+        if self.shared is not None:
+            self.shared.delete(self.key_prefix + key)
+
+    def invalidate_user(self, user_id):
+        """Сбрасывает кеш для всех токенов пользователя."""
+        for key in Token.objects.filter(
+            user_id=user_id
+        ).values_list('key', flat=True):
+            self.invalidate(key)
+
+    def stats(self):
+        return {
+            **self.local.stats(),
+            'shared_hits': self.shared_hits,
+            'shared_misses': self.shared_misses,
+        }
+
+
+token_user_cache = TokenUserCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication без запроса к БД при попадании в кеш."""
+
+    def authenticate_credentials(self, key):
+        user = token_user_cache.get_user(key)
+        if user is None:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.')
+            )
+        return (user, Token(key=key, user=user))
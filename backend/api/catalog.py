@@ -0,0 +1,97 @@
+"""
+Снимки справочников: теги и ингредиенты целиком, заранее
+отрендеренные в JSON и сжатые gzip. Снимок привязан к версии
+справочников и перестраивается после её смены.
+"""
+import gzip
+import re
+import threading
+from collections import namedtuple
+from hashlib import md5
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.http import quote_etag
+from rest_framework.renderers import JSONRenderer
+
+from recipes.models import Ingredient, Tag
+
+from .conditional import catalog_version, not_modified, set_validators
+from .constants import CATALOG_GZIP_LEVEL, CATALOG_SNAPSHOT_TIMEOUT
+from .serializers import IngredientSerializer, TagSerializer
+
+Snapshot = namedtuple('Snapshot', 'version body gzipped etag')
+
+ACCEPTS_GZIP = re.compile(r'\bgzip\b')
+
+
+class CatalogSnapshot:
+    """
+    Снимок справочника. Хранится в памяти процесса и в кеше Django
+    под ключом с версией, так что процессы с общим кешем строят
+    его один раз на версию.
+    """
+    key_prefix = 'catalog_snapshot:'
+
+    def __init__(self, name, queryset, serializer_class):
+        self.name = name
+        self.queryset = queryset
+        self.serializer_class = serializer_class
+        self._lock = threading.Lock()
+        self._snapshot = None
+
+    def _build(self, version):
+        body = JSONRenderer().render(
+            self.serializer_class(self.queryset.all(), many=True).data
+        )
+        return Snapshot(
+            version=version,
+            body=body,
+            gzipped=gzip.compress(body, CATALOG_GZIP_LEVEL),
+            etag=md5(body, usedforsecurity=False).hexdigest(),
+        )
+
+    def get(self):
+        version = catalog_version()
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.version != version:
+                key = f'{self.key_prefix}{self.name}:{version}'
+                snapshot = cache.get(key)
+                if snapshot is None:
+                    snapshot = self._build(version)
+                    cache.set(key, snapshot, CATALOG_SNAPSHOT_TIMEOUT)
+                self._snapshot = snapshot
+        return snapshot
+
+
+def snapshot_response(request, snapshot):
+    """
+    Отдаёт снимок как есть: сжатым, если клиент принимает gzip.
+    У сжатого варианта свой строгий ETag.
+    """
+    use_gzip = bool(
+        ACCEPTS_GZIP.search(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    )
+    etag = quote_etag(snapshot.etag + ('-gzip' if use_gzip else ''))
+    vary = ('Accept-Encoding',)
+    response = not_modified(request, etag, snapshot.version, vary)
+    if response is not None:
+        return response
+    if use_gzip:
+        response = HttpResponse(
+            snapshot.gzipped, content_type='application/json'
+        )
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(snapshot.body, content_type='application/json')
+    return set_validators(response, etag, snapshot.version, vary)
+
+
+tags_snapshot = CatalogSnapshot('tags', Tag.objects.all(), TagSerializer)
+ingredients_snapshot = CatalogSnapshot(
+    'ingredients', Ingredient.objects.all(), IngredientSerializer
+)
@@ -0,0 +1,95 @@
+"""
+Валидаторы условных GET-запросов (ETag / Last-Modified).
+Ответ 304 формируется до сериализации по дешёвым данным о версии.
+Last-Modified отдают только справочники: ответы с рецептами зависят
+от пользователя и удалений, которые дата изменения не отражает,
+поэтому их валидатор - только ETag.
+"""
+from hashlib import md5
+
+from django.db.models import Exists, OuterRef, Value
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from recipes.models import CatalogVersion
+from users.models import Subscription
+
+# Поля рецепта, от которых зависит его представление в API
+RECIPE_VERSION_FIELDS = (
+    'id',
+    'author_id',
+    'pub_date',
+    'updated_at',
+    'favorites_count',
+    'author__email',
+    'author__username',
+    'author__first_name',
+    'author__last_name',
+    'author__avatar',
+    'author__recipes_count',
+    'author__subscribers_count',
+    'is_favorited',
+    'is_in_shopping_cart',
+    'author_is_subscribed',
+)
+
+
+def catalog_version():
+    """
+    Версия справочников (теги и ингредиенты) - время их последнего
+    изменения. Хранится в БД: у всех процессов одна и та же версия,
+    и она меняется только при изменении справочников.
+    """
+    return CatalogVersion.objects.current().timestamp()
+
+
+def bump_catalog_version():
+    return CatalogVersion.objects.bump().timestamp()
+
+
+def recipe_versions(queryset, user):
+    """
+    Строки с версиями рецептов queryset (с аннотациями is_favorited и
+    is_in_shopping_cart), включая признак подписки на автора.
+    """
+    if user.is_authenticated:
+        is_subscribed = Exists(Subscription.objects.filter(
+            user=user, author=OuterRef('author')
+        ))
+    else:
+        is_subscribed = Value(False)
+    return queryset.prefetch_related(None).annotate(
+        author_is_subscribed=is_subscribed
+    ).values(*RECIPE_VERSION_FIELDS)
+
+
+def make_etag(*parts):
+    return quote_etag(
+        md5(repr(parts).encode(), usedforsecurity=False).hexdigest()
+    )
+
+
+def set_validators(response, etag, last_modified=None,
+                   vary=('Authorization',)):
+    """
+    Проставляет валидаторы. По умолчанию ответ зависит от пользователя:
+    его флаги входят в ETag.
+    """
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    patch_vary_headers(response, vary)
+    return response
+
+
+def not_modified(request, etag, last_modified=None,
+                 vary=('Authorization',)):
+    """Ответ 304 (или 412), если валидаторы клиента совпали, иначе None."""
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=None if last_modified is None else int(last_modified)
+    )
+    if response is not None:
+        set_validators(response, etag, last_modified, vary)
+    return response
@@ -1,3 +1,34 @@
-"""Константы для пагинации."""
+"""Константы для API."""
 
+# Пагинация
 PAGINATION_PAGE_SIZE = 10
+RECIPE_CURSOR_ORDERING = ('-pub_date', '-id')
+
+# Пакетное создание рецептов: рецептов в запросе
+# и строк в одном UPDATE коротких ссылок
+RECIPE_BATCH_MAX_SIZE = 500
+RECIPE_BATCH_UPDATE_SIZE = 1000
+
+# Пакетные избранное, корзина и подписки: id в запросе
+BULK_IDS_MAX_SIZE = 500
+
+# Поисковый индекс ингредиентов
+INGREDIENT_INDEX_NGRAM_SIZE = 3
+
+# Список покупок
+SHOPPING_LIST_CHUNK_SIZE = 500
+
+# Короткие ссылки
+SHORT_LINK_CACHE_SIZE = 10000
+SHORT_LINK_CACHE_TTL = 60
+SHORT_LINK_SHARED_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Снимки справочников
+CATALOG_SNAPSHOT_TIMEOUT = 60 * 60 * 24
+CATALOG_GZIP_LEVEL = 6
+
+# Кеш токенов
+TOKEN_CACHE_SIZE = 10000
+# Сколько процесс может принимать токен после выхода в другом процессе
+TOKEN_CACHE_TTL = 5
+TOKEN_SHARED_CACHE_TIMEOUT = 60 * 5
@@ -1,13 +1,59 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import TrigramSimilarity
 from django.db import connection
-from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models import (Case, CharField, Exists, Func, IntegerField,
+                              OuterRef, Q, Value, When)
 from django_filters import rest_framework as filters
 
-from recipes.models import Ingredient, Recipe
+from recipes.models import Ingredient, Recipe, Tag
 
 User = get_user_model()
 
 
+class Casefold(Func):
+    """
+    str.casefold() в SQLite. Функция регистрируется для каждого
+    соединения (api.signals.register_sqlite_functions).
+    """
+    function = 'CASEFOLD'
+    output_field = CharField()
+
+
+def casefold(value):
+    return None if value is None else value.casefold()
+
+
+def search_by_name(queryset, value):
+    """
+    Поиск по вхождению в название без учёта регистра.
+    Сначала совпадения с начала названия, затем остальные.
+    На PostgreSQL внутри групп - по триграммному сходству.
+    UPPER() в SQLite меняет регистр только латиницы, поэтому
+    в SQLite (разработка и тесты) названия сравниваются функцией
+    CASEFOLD - тем же запросом, без выборки таблицы в Python.
+    """
+    if connection.vendor == 'sqlite':
+        value = value.casefold()
+        queryset = queryset.alias(folded_name=Casefold('name'))
+        matches = queryset.filter(folded_name__contains=value)
+        starts_with = Q(folded_name__startswith=value)
+    else:
+        matches = queryset.filter(name__icontains=value)
+        starts_with = Q(name__istartswith=value)
+    queryset = matches.annotate(
+        name_priority=Case(
+            When(starts_with, then=Value(0)),
+            default=Value(1),
+            output_field=IntegerField(),
+        )
+    )
+    if connection.vendor == 'postgresql':
+        return queryset.annotate(
+            similarity=TrigramSimilarity('name', value)
+        ).order_by('name_priority', '-similarity', 'name')
+    return queryset.order_by('name_priority', 'name')
+
+
 class RecipeFilter(filters.FilterSet):
     """Фильтр для рецептов."""
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
@@ -15,11 +61,40 @@ class RecipeFilter(filters.FilterSet):
         method='filter_is_in_shopping_cart'
     )
     author = filters.ModelChoiceFilter(queryset=User.objects.all())
-    tags = filters.AllValuesMultipleFilter(field_name='tags__slug')
+    # Допустимые значения - slug из таблицы тегов, а не DISTINCT
+    # по всем рецептам (как у AllValuesMultipleFilter) на каждый запрос
+    tags = filters.ModelMultipleChoiceFilter(
+        field_name='tags__slug',
+        to_field_name='slug',
+        queryset=Tag.objects.all(),
+        method='filter_tags',
+    )
+    name = filters.CharFilter(
+        method='filter_name', label='Поиск по названию')
 
     class Meta:
         model = Recipe
-        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart')
+        fields = (
+            'author', 'tags', 'name', 'is_favorited', 'is_in_shopping_cart'
+        )
+
+    def filter_name(self, queryset, name, value):
+        if not value:
+            return queryset
+        return search_by_name(queryset, value)
+
+    def filter_tags(self, queryset, name, value):
+        """
+        Рецепты хотя бы с одним из тегов. EXISTS вместо JOIN
+        с DISTINCT по всем полям рецепта на всю выборку.
+        """
+        if not value:
+            return queryset
+        return queryset.filter(Exists(
+            Recipe.tags.through.objects.filter(
+                recipe=OuterRef('pk'), tag__in=value
+            )
+        ))
 
     def filter_is_favorited(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
@@ -43,40 +118,4 @@ class IngredientFilter(filters.FilterSet):
     def filter_name(self, queryset, name, value):
         if not value:
             return queryset
-
-        value_lower = value.lower()
-
-        # Если бд - SQLite, фильтруем вручную
-        if connection.vendor == 'sqlite':
-
-            starts_with = sorted(
-                [obj for obj in queryset
-                 if obj.name.lower().startswith(value_lower)],
-                key=lambda obj: obj.name
-            )
-            contains = sorted(
-                [obj for obj in queryset if value_lower
-                 in obj.name.lower() and obj not in starts_with],
-                key=lambda obj: obj.name
-            )
-
-            sorted_objects = starts_with + contains
-            preserved_order = Case(
-                *[When(id=obj.id, then=Value(idx)) for idx, obj
-                  in enumerate(sorted_objects)],
-                output_field=IntegerField(),
-            )
-
-            return queryset.filter(
-                id__in=[obj.id for obj in sorted_objects]
-            ).order_by(preserved_order)
-
-        # Если бд - PostgreSQL, фильтруем стандартным способом
-        return queryset.annotate(
-            priority=Case(
-                When(name__istartswith=value_lower, then=Value(0)),
-                When(name__icontains=value_lower, then=Value(1)),
-                default=Value(2),
-                output_field=IntegerField(),
-            )
-        ).filter(Q(name__icontains=value_lower)).order_by('priority', 'name')
+        return search_by_name(queryset, value)
@@ -1,9 +1,77 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
-from .constants import PAGINATION_PAGE_SIZE
+from .constants import PAGINATION_PAGE_SIZE, RECIPE_CURSOR_ORDERING
 
 
 class CustomPagination(PageNumberPagination):
     """Кастомный класс пагинации."""
     page_size = PAGINATION_PAGE_SIZE
     page_size_query_param = 'limit'
+
+
+class RecipeCursorPagination(CursorPagination):
+    """
+    Курсорная пагинация ленты рецептов по (-pub_date, -id).
+    Не считает COUNT(*) и не использует OFFSET.
+    """
+    page_size = PAGINATION_PAGE_SIZE
+    page_size_query_param = 'limit'
+    ordering = RECIPE_CURSOR_ORDERING
+
+    def get_ordering(self, request, queryset, view):
+        """
+        Сортировка из ?ordering=, иначе по дате публикации.
+        Курсор хранит позицию по первому полю и смещение среди равных,
+        поэтому порядок всегда доопределяется уникальным -id.
+        """
+        ordering = OrderingFilter().get_ordering(request, queryset, view)
+        if not ordering:
+            return self.ordering
+        ordering = tuple(ordering)
+        if not {'id', '-id', 'pk', '-pk'} & set(ordering):
+            ordering += ('-id',)
+        return ordering
+
+
+class RecipePagination(CustomPagination):
+    """
+    Пагинация рецептов.
+    По умолчанию - постраничная, курсорная включается
+    параметром ?pagination=cursor (или наличием ?cursor=).
+    """
+    cursor_pagination_class = RecipeCursorPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if (
+            self.cursor_pagination_class.cursor_query_param
+            in request.query_params
+            or request.query_params.get('pagination') == 'cursor'
+        ):
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_page_info(self):
+        """
+        Ссылки и число рецептов текущей страницы без самих рецептов:
+        то же, что окружает результаты в ответе. Входит в ETag ленты.
+        """
+        if self.cursor_paginator is not None:
+            return (
+                self.cursor_paginator.get_next_link(),
+                self.cursor_paginator.get_previous_link(),
+            )
+        return (
+            self.page.paginator.count,
+            self.get_next_link(),
+            self.get_previous_link(),
+        )
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,83 @@
+"""
+Пакетные связи пользователя с объектами: избранное, корзина, подписки.
+Связи добавляются одним INSERT ... ON CONFLICT DO NOTHING RETURNING
+и удаляются одним delete(), изменёнными считаются только
+действительно записанные строки.
+"""
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+
+User = get_user_model()
+
+
+def lock_user(user):
+    """
+    Блокирует строку пользователя до конца транзакции. Все изменения
+    его избранного, корзины и подписок (поштучные и пакетные) идут
+    под этой блокировкой и не перемежаются.
+    """
+    list(User.objects.select_for_update().filter(pk=user.pk).values('pk'))
+
+
+def insert_relations(model, user, field, ids):
+    """
+    Вставляет связи пользователя с объектами ids, пропуская
+    существующие. Возвращает множество id, для которых строка
+    действительно вставлена. bulk_create(ignore_conflicts=True)
+    не сообщает, какие строки пропущены, поэтому запрос свой.
+    """
+    if not ids:
+        return set()
+    quote = connection.ops.quote_name
+    user_column = model._meta.get_field('user').column
+    target_column = model._meta.get_field(field).column
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(model._meta.db_table)} '
+            f'({quote(user_column)}, {quote(target_column)}) '
+            f'VALUES {", ".join(["(%s, %s)"] * len(ids))} '
+            f'ON CONFLICT DO NOTHING RETURNING {quote(target_column)}',
+            [value for pk in ids for value in (user.pk, pk)]
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+
+@transaction.atomic
+def change_relations(model, user, field, targets, ids, add, on_change):
+    """
+    Добавляет (add=True) или удаляет связи model пользователя user
+    с объектами targets по их id; field - поле связи с объектом.
+    on_change(changed_ids, sign) в той же транзакции обновляет
+    производные данные. Возвращает словарь списков id: changed -
+    связь изменена, unchanged - уже была (или уже отсутствовала),
+    invalid - объекта нет среди targets.
+    """
+    ids = list(dict.fromkeys(ids))
+    valid = set(targets.filter(pk__in=ids).values_list('pk', flat=True))
+    lock_user(user)
+
+    if add:
+        inserted = insert_relations(
+            model, user, field, [pk for pk in ids if pk in valid]
+        )
+        changed = [pk for pk in ids if pk in inserted]
+    else:
+        relations = model.objects.filter(
+            user=user, **{f'{field}_id__in': valid}
+        )
+        # Под блокировкой пользователя найденные строки и есть удаляемые
+        changed_set = set(relations.values_list(f'{field}_id', flat=True))
+        if changed_set:
+            relations.filter(**{f'{field}_id__in': changed_set}).delete()
+        changed = [pk for pk in ids if pk in changed_set]
+    if changed:
+        on_change(changed, 1 if add else -1)
+
+    changed_set = set(changed)
+    return {
+        'changed': changed,
+        'unchanged': [
+            pk for pk in ids if pk in valid and pk not in changed_set
+        ],
+        'invalid': [pk for pk in ids if pk not in valid],
+    }
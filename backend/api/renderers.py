@@ -0,0 +1,62 @@
+import csv
+import json
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+class Echo:
+    """Псевдо-буфер для csv.writer: возвращает записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+class ShoppingListTextRenderer(BaseRenderer):
+    """Список покупок в виде текста."""
+    media_type = 'text/plain'
+    format = 'txt'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            data = '\n'.join(f'{key}: {value}' for key, value in data.items())
+        return str(data).encode(self.charset)
+
+    def render_stream(self, items):
+        """Построчно отдаёт список покупок."""
+        yield 'Список покупок:'
+        for item in items:
+            yield (
+                f"\n{item['name']}: {item['total_amount']} "
+                f"{item['measurement_unit']}"
+            )
+
+
+class ShoppingListCSVRenderer(ShoppingListTextRenderer):
+    """Список покупок в формате CSV."""
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def render_stream(self, items):
+        writer = csv.writer(Echo())
+        yield writer.writerow(('name', 'measurement_unit', 'amount'))
+        for item in items:
+            yield writer.writerow((
+                item['name'], item['measurement_unit'], item['total_amount']
+            ))
+
+
+class ShoppingListJSONRenderer(JSONRenderer):
+    """Список покупок в формате JSON."""
+
+    def render_stream(self, items):
+        separator = ''
+        yield '['
+        for item in items:
+            yield separator + json.dumps({
+                'name': item['name'],
+                'measurement_unit': item['measurement_unit'],
+                'amount': item['total_amount'],
+            }, ensure_ascii=False)
+            separator = ','
+        yield ']'
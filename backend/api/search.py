@@ -0,0 +1,112 @@
+"""Поисковый индекс ингредиентов в памяти процесса."""
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+from recipes.models import Ingredient
+
+from .conditional import catalog_version
+from .constants import INGREDIENT_INDEX_NGRAM_SIZE
+
+
+def ngrams(value, size):
+    """Все подстроки value длиной от 1 до size."""
+    return {
+        value[start:start + length]
+        for length in range(1, size + 1)
+        for start in range(len(value) - length + 1)
+    }
+
+
+class IngredientSearchIndex:
+    """
+    Индекс для автодополнения ингредиентов.
+    - Отсортированный массив названий для поиска по началу строки.
+    - N-граммный индекс для поиска по вхождению.
+    Индекс строится лениво и привязан к версии справочников, как
+    снимки api.catalog: после изменения ингредиентов в любом процессе
+    он перестраивается при следующем поиске, и ответ не расходится
+    с ETag, построенным по той же версии.
+    """
+
+    def __init__(self, ngram_size=INGREDIENT_INDEX_NGRAM_SIZE):
+        self.ngram_size = ngram_size
+        self._lock = threading.Lock()
+        self._state = None
+
+    def _build(self, version):
+        rows = list(
+            Ingredient.objects.order_by('name', 'measurement_unit')
+            .values('id', 'name', 'measurement_unit')
+        )
+        names = [row['name'].lower() for row in rows]
+        prefixes = sorted(
+            (name, position) for position, name in enumerate(names)
+        )
+        grams = defaultdict(set)
+        for position, name in enumerate(names):
+            for gram in ngrams(name, self.ngram_size):
+                grams[gram].add(position)
+        return {
+            'version': version,
+            'rows': rows,
+            'names': names,
+            'prefixes': prefixes,
+            'prefix_keys': [name for name, _ in prefixes],
+            'grams': dict(grams),
+        }
+
+    def _get_state(self):
+        version = catalog_version()
+        state = self._state
+        if state is not None and state['version'] == version:
+            return state
+        with self._lock:
+            state = self._state
+            if state is None or state['version'] != version:
+                state = self._build(version)
+                self._state = state
+        return state
+
+    def _starts_with(self, state, value):
+        start = bisect_left(state['prefix_keys'], value)
+        positions = []
+        for name, position in state['prefixes'][start:]:
+            if not name.startswith(value):
+                break
+            positions.append(position)
+        return sorted(positions)
+
+    def _contains(self, state, value):
+        if len(value) <= self.ngram_size:
+            return state['grams'].get(value, set())
+        candidates = None
+        for start in range(len(value) - self.ngram_size + 1):
+            gram = value[start:start + self.ngram_size]
+            positions = state['grams'].get(gram, set())
+            candidates = (
+                positions if candidates is None else candidates & positions
+            )
+            if not candidates:
+                return set()
+        return {
+            position for position in candidates
+            if value in state['names'][position]
+        }
+
+    def search(self, value):
+        """
+        Ингредиенты, название которых содержит value.
+        Сначала идут начинающиеся с value, затем остальные,
+        внутри каждой группы - по алфавиту.
+        """
+        value = value.lower()
+        state = self._get_state()
+        starts_with = self._starts_with(state, value)
+        contains = sorted(
+            self._contains(state, value).difference(starts_with)
+        )
+        return [state['rows'][position] for position in starts_with + contains]
+
+
+ingredient_index = IngredientSearchIndex()
@@ -1,14 +1,47 @@
 from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.db import models, transaction
+from django.db.models import prefetch_related_objects
+from django.db.models.fields.files import FieldFile
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
+from rest_framework.fields import empty
 
+from recipes.counters import change_counter
+from recipes.images import schedule_recipe_image, schedule_variants_removal
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart, Tag)
+                            ShoppingCart, ShoppingListItem, Tag)
+from recipes.short_links import to_base62
 from users.models import Subscription
 
+from .constants import BULK_IDS_MAX_SIZE, RECIPE_BATCH_UPDATE_SIZE
+
 User = get_user_model()
 
 
+class CustomUserListSerializer(serializers.ListSerializer):
+    """
+    Список пользователей.
+    Подписки текущего пользователя на всех авторов страницы
+    определяются одним запросом.
+    """
+
+    def to_representation(self, data):
+        users = list(
+            data.all() if isinstance(data, models.manager.BaseManager)
+            else data
+        )
+        request = self.context.get('request')
+        if request and request.user.is_authenticated:
+            self.context['subscribed_ids'] = set(
+                Subscription.objects.filter(
+                    user=request.user,
+                    author_id__in=[user.id for user in users]
+                ).values_list('author_id', flat=True)
+            )
+        return super().to_representation(users)
+
+
 class CustomUserSerializer(serializers.ModelSerializer):
     """Сериализатор Users."""
 
@@ -25,7 +58,10 @@ class CustomUserSerializer(serializers.ModelSerializer):
             'last_name',
             'is_subscribed',
             'avatar',
+            'recipes_count',
+            'subscribers_count',
         )
+        list_serializer_class = CustomUserListSerializer
 
     def validate(self, attrs):
         """Валидация полей пользователя."""
@@ -40,6 +76,11 @@ class CustomUserSerializer(serializers.ModelSerializer):
 
     def get_is_subscribed(self, obj):
         """Проверяет, подписан ли текущий пользователь на данного автора."""
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        subscribed_ids = self.context.get('subscribed_ids')
+        if subscribed_ids is not None:
+            return obj.id in subscribed_ids
         return (
             self.context.get('request')
             and self.context['request'].user.is_authenticated
@@ -52,35 +93,32 @@ class CustomUserSerializer(serializers.ModelSerializer):
 class SubscriptionSerializer(CustomUserSerializer):
     """Сериализатор для отображения подписок."""
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.IntegerField(
-        source='recipes.count',
-        read_only=True
-    )
 
     class Meta:
         model = User
-        fields = CustomUserSerializer.Meta.fields + (
-            'recipes', 'recipes_count'
-        )
+        fields = CustomUserSerializer.Meta.fields + ('recipes',)
+
+    @staticmethod
+    def get_recipes_limit(request):
+        """Значение параметра recipes_limit или None."""
+        recipes_limit = request.query_params.get('recipes_limit', '')
+        if recipes_limit.isdigit() and int(recipes_limit) > 0:
+            return int(recipes_limit)
+        return None
 
     def get_is_subscribed(self, obj):
         """Всегда True, так как это список подписок."""
         return True
 
     def get_recipes(self, obj):
-        """Получение рецептов автора."""
-        request = self.context.get('request')
-
-        recipes_limit = request.query_params.get('recipes_limit')
-
-        # Проверка наличия и корректности параметра
-        if recipes_limit and recipes_limit.isdigit():
-            recipes_limit = int(recipes_limit)
-            if recipes_limit > 0:
-                recipes = obj.recipes.all()[:recipes_limit]
-        else:
-            recipes = obj.recipes.all()
-
+        """
+        Получение рецептов автора.
+        В списке подписок рецепты уже ограничены на стороне БД.
+        """
+        recipes = obj.recipes.all()
+        recipes_limit = self.get_recipes_limit(self.context['request'])
+        if recipes_limit:
+            recipes = recipes[:recipes_limit]
         return RecipeShortSerializer(recipes, many=True).data
 
 
@@ -115,13 +153,32 @@ class SubscriptionCreateSerializer(serializers.ModelSerializer):
         ).data
 
 
-class RecipeShortSerializer(serializers.ModelSerializer):
+class ImageVariantsMixin:
+    """Ссылки на уменьшенные копии картинки рецепта."""
+
+    def get_images(self, obj):
+        """
+        Словарь {вариант: URL}.
+        Пустой, пока копии ещё не созданы в фоне.
+        """
+        request = self.context.get('request')
+        images = {}
+        for name, path in obj.image_variants.items():
+            url = default_storage.url(path)
+            images[name] = (
+                request.build_absolute_uri(url) if request else url
+            )
+        return images
+
+
+class RecipeShortSerializer(ImageVariantsMixin, serializers.ModelSerializer):
     """Сериализатор для информации о рецепте для SubscriptionSerializer."""
     image = serializers.ImageField()
+    images = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'images', 'cooking_time')
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -154,7 +211,7 @@ class IngredientInRecipeSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(ImageVariantsMixin, serializers.ModelSerializer):
     """Сериализатор для просмотра рецептов."""
     tags = TagSerializer(many=True, read_only=True)
     author = CustomUserSerializer(read_only=True)
@@ -163,6 +220,7 @@ class RecipeSerializer(serializers.ModelSerializer):
     )
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
+    images = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
@@ -175,13 +233,17 @@ class RecipeSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'images',
             'text',
             'cooking_time',
+            'favorites_count',
         )
         read_only_fields = ('id', 'author')
 
     def get_is_favorited(self, obj):
         """Добавлен ли рецепт в избранное."""
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         return (
             self.context.get('request')
             and self.context['request'].user.is_authenticated
@@ -192,6 +254,8 @@ class RecipeSerializer(serializers.ModelSerializer):
 
     def get_is_in_shopping_cart(self, obj):
         """Добавлен ли рецепт в список покупок."""
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         return (
             self.context.get('request')
             and self.context['request'].user.is_authenticated
@@ -202,24 +266,122 @@ class RecipeSerializer(serializers.ModelSerializer):
 
 
 class IngredientCreateSerializer(serializers.ModelSerializer):
-    """Сериализатор для ингредиентов в RecipeCreateSerializer."""
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all(),
-        source='ingredient'
-    )
+    """
+    Сериализатор для ингредиентов в RecipeCreateSerializer.
+    Существование ингредиентов проверяет RecipeCreateSerializer
+    одним запросом на весь рецепт.
+    """
+    id = serializers.IntegerField(source='ingredient_id')
 
     class Meta:
         model = RecipeIngredient
         fields = ('id', 'amount')
 
 
+class RecipeListCreateSerializer(serializers.ListSerializer):
+    """
+    Пакетное создание рецептов.
+    Теги и ингредиенты всех элементов проверяются двумя запросами,
+    рецепты и их связи вставляются через bulk_create. При
+    context['allow_partial'] ошибочные элементы пропускаются;
+    ошибки по каждому элементу (пустые для корректных)
+    сохраняются в item_errors.
+    """
+
+    @staticmethod
+    def collect_ids(data):
+        """Целые id тегов и ингредиентов из ещё не проверенных данных."""
+        tag_ids, ingredient_ids = set(), set()
+        for item in data:
+            if not isinstance(item, dict):
+                continue
+            tags = item.get('tags')
+            ingredients = item.get('ingredients')
+            for pk in tags if isinstance(tags, list) else ():
+                if isinstance(pk, int):
+                    tag_ids.add(pk)
+            for ingredient in (
+                ingredients if isinstance(ingredients, list) else ()
+            ):
+                pk = isinstance(ingredient, dict) and ingredient.get('id')
+                if isinstance(pk, int):
+                    ingredient_ids.add(pk)
+        return tag_ids, ingredient_ids
+
+    def run_validation(self, data=empty):
+        """
+        Существующие теги и ингредиенты всего пакета находятся двумя
+        запросами до проверки элементов (known_ids, их читает
+        RecipeCreateSerializer.missing_ids). При allow_partial ошибки
+        элементов не отменяют пакет, если корректен хотя бы один.
+        """
+        checked = isinstance(data, list) and (
+            self.max_length is None or len(data) <= self.max_length
+        )
+        tag_ids, ingredient_ids = self.collect_ids(data if checked else ())
+        self.known_ids = {
+            Tag: Tag.objects.in_bulk(tag_ids),
+            Ingredient: Ingredient.objects.in_bulk(ingredient_ids),
+        }
+        self.valid_items = []
+        try:
+            validated = super().run_validation(data)
+        except serializers.ValidationError as exc:
+            errors = exc.detail
+            if not (
+                self.context.get('allow_partial')
+                and isinstance(errors, list) and not all(errors)
+            ):
+                raise
+            self.item_errors = errors
+            return self.valid_items
+        self.item_errors = [{} for _ in validated]
+        return validated
+
+    def run_child_validation(self, data):
+        validated = super().run_child_validation(data)
+        self.valid_items.append(validated)
+        return validated
+
+    @transaction.atomic
+    def create(self, validated_data):
+        author = self.context['request'].user
+        recipes = Recipe.objects.bulk_create([
+            Recipe(author=author, **{
+                field: value for field, value in item.items()
+                if field not in ('ingredients', 'tags')
+            })
+            for item in validated_data
+        ])
+        # Код ссылки выводится из pk, как в Recipe.save
+        for recipe in recipes:
+            recipe.short_link = to_base62(recipe.pk)
+        Recipe.objects.bulk_update(
+            recipes, ('short_link',), batch_size=RECIPE_BATCH_UPDATE_SIZE
+        )
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(recipe=recipe, **ingredient)
+            for recipe, item in zip(recipes, validated_data)
+            for ingredient in item['ingredients']
+        ])
+        Recipe.tags.through.objects.bulk_create([
+            Recipe.tags.through(recipe=recipe, tag_id=tag_id)
+            for recipe, item in zip(recipes, validated_data)
+            for tag_id in item['tags']
+        ])
+        # bulk_create не отправляет post_save: счётчик меняется здесь
+        change_counter(User, 'recipes_count', {author.pk: len(recipes)})
+        for recipe in recipes:
+            schedule_recipe_image(recipe.id)
+        return recipes
+
+
 class RecipeCreateSerializer(serializers.ModelSerializer):
     """Сериализатор для создания/обновления рецептов."""
     ingredients = IngredientCreateSerializer(required=True, many=True)
-    tags = serializers.PrimaryKeyRelatedField(
-        required=True,
-        queryset=Tag.objects.all(),
-        many=True
+    tags = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=True
     )
     image = Base64ImageField(required=True)
 
@@ -233,6 +395,7 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             'text',
             'cooking_time',
         )
+        list_serializer_class = RecipeListCreateSerializer
 
     def validate_image(self, value):
         """Проверка изображения."""
@@ -245,6 +408,17 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
 
         return value
 
+    def missing_ids(self, model, ids):
+        """
+        Id из ids, которых нет в таблице model: один запрос in_bulk.
+        В пакете рецептов существующие id всех элементов заранее
+        находит родительский RecipeListCreateSerializer.
+        """
+        found = getattr(self.parent, 'known_ids', {}).get(model)
+        if found is None:
+            found = model.objects.in_bulk(ids)
+        return [pk for pk in ids if pk not in found]
+
     def validate(self, attrs):
         """Валидация полей рецепта."""
         ingredients = attrs.get('ingredients', [])
@@ -259,49 +433,152 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
                 'Добавьте хотя бы один ингредиент!'
             )
 
-        tag_ids = [tag.id for tag in tags]
-        if len(tag_ids) != len(set(tag_ids)):
+        if len(tags) != len(set(tags)):
             raise serializers.ValidationError('Теги не должны повторяться.')
 
-        ingredients = [item['ingredient'] for item in ingredients]
-        if len(ingredients) != len(set(ingredients)):
+        ingredient_ids = [item['ingredient_id'] for item in ingredients]
+        if len(ingredient_ids) != len(set(ingredient_ids)):
             raise serializers.ValidationError(
                 'Ингредиенты не должны повторяться.'
             )
 
+        message = serializers.PrimaryKeyRelatedField.default_error_messages[
+            'does_not_exist'
+        ]
+        errors = {
+            field: [message.format(pk_value=pk) for pk in missing]
+            for field, missing in (
+                ('tags', self.missing_ids(Tag, tags)),
+                ('ingredients', self.missing_ids(Ingredient, ingredient_ids)),
+            )
+            if missing
+        }
+        if errors:
+            raise serializers.ValidationError(errors)
+
         return attrs
 
     @staticmethod
-    def handle_ingredients(instance, ingredients_data):
-        """Обработка ингредиентов для рецепта."""
-        RecipeIngredient.objects.filter(recipe=instance).delete()
+    def handle_tags(instance, tag_ids, created=False):
+        """
+        Связи рецепта с тегами: добавляются и удаляются только
+        отличающиеся, без изменений запись не выполняется.
+        """
+        through = Recipe.tags.through
+        current = set() if created else set(
+            through.objects.filter(recipe=instance).values_list(
+                'tag_id', flat=True
+            )
+        )
+        removed = current - set(tag_ids)
+        if removed:
+            through.objects.filter(
+                recipe=instance, tag_id__in=removed
+            ).delete()
+        through.objects.bulk_create([
+            through(recipe=instance, tag_id=tag_id)
+            for tag_id in tag_ids if tag_id not in current
+        ])
 
-        RecipeIngredient.objects.bulk_create([
-            RecipeIngredient(recipe=instance, **ingredient_data)
+    @staticmethod
+    def handle_ingredients(instance, ingredients_data, created=False):
+        """
+        Обработка ингредиентов для рецепта.
+        С текущими строками сравниваются новые: удаляются, добавляются
+        и обновляются только отличающиеся. Изменения сразу учитываются
+        в списках покупок, где этот рецепт уже лежит в корзине:
+        удаление - сигналом pre_delete, bulk_update и bulk_create
+        сигналов не отправляют и учитываются здесь.
+        """
+        current = {} if created else {
+            row.ingredient_id: row
+            for row in RecipeIngredient.objects.filter(recipe=instance)
+        }
+        new_amounts = {
+            ingredient_data['ingredient_id']: ingredient_data['amount']
             for ingredient_data in ingredients_data
+        }
+        old_amounts = {
+            ingredient_id: row.amount
+            for ingredient_id, row in current.items()
+            if ingredient_id in new_amounts
+        }
+
+        removed = [
+            row.id for ingredient_id, row in current.items()
+            if ingredient_id not in new_amounts
+        ]
+        if removed:
+            RecipeIngredient.objects.filter(id__in=removed).delete()
+        changed = []
+        for ingredient_id, amount in new_amounts.items():
+            row = current.get(ingredient_id)
+            if row is not None and row.amount != amount:
+                row.amount = amount
+                changed.append(row)
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ('amount',))
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(
+                recipe=instance, ingredient_id=ingredient_id, amount=amount
+            )
+            for ingredient_id, amount in new_amounts.items()
+            if ingredient_id not in current
         ])
 
+        if not created and old_amounts != new_amounts:
+            ShoppingListItem.objects.change_recipe(
+                instance, old_amounts, new_amounts
+            )
+
+    @transaction.atomic
     def create(self, validated_data):
         author = self.context.get('request').user
+        deferred = author.get_deferred_fields()
+        if deferred:
+            # Пользователь из кеша токенов загружен не целиком, а ответ
+            # показывает автора: остальные поля читаются одним запросом
+            author.refresh_from_db(fields=deferred)
         ingredients_data = validated_data.pop('ingredients')
         tags_data = validated_data.pop('tags')
 
         recipe = Recipe.objects.create(author=author, **validated_data)
-        recipe.tags.set(tags_data)
-
-        self.handle_ingredients(recipe, ingredients_data)
+        # Новый рецепт ещё не связан ни с тегами, ни с корзинами
+        self.handle_tags(recipe, tags_data, created=True)
+        self.handle_ingredients(recipe, ingredients_data, created=True)
+        schedule_recipe_image(recipe.id)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients_data = validated_data.pop('ingredients', None)
         tags_data = validated_data.pop('tags', None)
 
-        instance.tags.set(tags_data)
-        self.handle_ingredients(instance, ingredients_data)
+        if tags_data is not None:
+            self.handle_tags(instance, tags_data)
+        if ingredients_data is not None:
+            self.handle_ingredients(instance, ingredients_data)
+
+        image = validated_data.get('image')
+        if image and not isinstance(image, FieldFile):
+            # Новая картинка: старые копии больше не актуальны
+            schedule_variants_removal(
+                instance.image.name, instance.image_variants
+            )
+            # save() не пишет image_variants: сброс - отдельным update(),
+            # до коммита и запуска обработчика новой картинки
+            Recipe.objects.filter(pk=instance.pk).update(image_variants={})
+            instance.image_variants = {}
+            schedule_recipe_image(instance.id)
 
         return super().update(instance, validated_data)
 
     def to_representation(self, instance):
+        # Связи после записи загружаются заново фиксированным
+        # числом запросов, а не по запросу на ингредиент
+        prefetch_related_objects(
+            [instance], 'tags', 'recipe_ingredients__ingredient'
+        )
         serializer = RecipeSerializer(
             instance, context={'request': self.context.get('request')}
         )
@@ -309,6 +586,15 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         return serializer.data
 
 
+class BulkIdsSerializer(serializers.Serializer):
+    """Список id рецептов или авторов для пакетных операций."""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BULK_IDS_MAX_SIZE
+    )
+
+
 class BaseRecipeRelationSerializer(serializers.ModelSerializer):
     """Базовый сериализатор для моделей Favorite и ShoppingCart."""
 
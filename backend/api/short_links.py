@@ -0,0 +1,78 @@
+"""Разрешение коротких ссылок с кешированием."""
+from django.conf import settings
+from django.core.cache import cache
+
+from recipes.models import Recipe
+
+from .cache import LRUCache
+from .constants import (SHORT_LINK_CACHE_SIZE, SHORT_LINK_CACHE_TTL,
+                        SHORT_LINK_SHARED_CACHE_TIMEOUT)
+
+
+class ShortLinkResolver:
+    """
+    Короткая ссылка -> pk рецепта.
+    Первый уровень - LRU в памяти процесса с коротким TTL,
+    второй (по SHORT_LINK_SHARED_CACHE) - общий кеш Django.
+    """
+    key_prefix = 'short_link:'
+
+    def __init__(self, maxsize=SHORT_LINK_CACHE_SIZE,
+                 ttl=SHORT_LINK_CACHE_TTL):
+        self.local = LRUCache(maxsize, ttl)
+
+    @property
+    def shared(self):
+        return cache if settings.SHORT_LINK_SHARED_CACHE else None
+
+    def resolve(self, short_link):
+        """pk рецепта или None, если ссылка не найдена."""
+        pk = self.local.get(short_link)
+        if pk is not None:
+            return pk
+        shared = self.shared
+        if shared is not None:
+            pk = shared.get(self.key_prefix + short_link)
+        if pk is None:
+            pk = Recipe.objects.filter(
+                short_link=short_link
+            ).values_list('pk', flat=True).first()
+            if pk is None:
+                return None
+            if shared is not None:
+                shared.set(
+                    self.key_prefix + short_link, pk,
+                    SHORT_LINK_SHARED_CACHE_TIMEOUT
+                )
+        self.local.set(short_link, pk)
+        return pk
+
+    async def aresolve(self, short_link):
+        """Асинхронный вариант resolve."""
+        pk = self.local.get(short_link)
+        if pk is not None:
+            return pk
+        shared = self.shared
+        if shared is not None:
+            pk = await shared.aget(self.key_prefix + short_link)
+        if pk is None:
+            pk = await Recipe.objects.filter(
+                short_link=short_link
+            ).values_list('pk', flat=True).afirst()
+            if pk is None:
+                return None
+            if shared is not None:
+                await shared.aset(
+                    self.key_prefix + short_link, pk,
+                    SHORT_LINK_SHARED_CACHE_TIMEOUT
+                )
+        self.local.set(short_link, pk)
+        return pk
+
+    def invalidate(self, short_link):
+        self.local.delete(short_link)
+        if self.shared is not None:
+            self.shared.delete(self.key_prefix + short_link)
+
+
+short_link_resolver = ShortLinkResolver()
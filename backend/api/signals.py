@@ -0,0 +1,54 @@
+from django.contrib.auth import get_user_model
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Ingredient, Recipe, Tag
+from recipes.signals import catalog_imported
+
+from .authentication import token_user_cache
+from .conditional import bump_catalog_version
+from .filters import Casefold, casefold
+from .short_links import short_link_resolver
+
+User = get_user_model()
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+@receiver((post_save, post_delete), sender=Tag)
+@receiver(catalog_imported)
+def change_catalog_version(**kwargs):
+    """
+    Новая версия справочников: ETag, Last-Modified, снимки
+    и поисковый индекс ингредиентов.
+    """
+    bump_catalog_version()
+
+
+@receiver(post_delete, sender=Recipe)
+def invalidate_short_link(instance, **kwargs):
+    """Убирает короткую ссылку удалённого рецепта из кешей."""
+    if instance.short_link:
+        short_link_resolver.invalidate(instance.short_link)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_token(instance, **kwargs):
+    """Выход (token/logout) и удаление пользователя удаляют токен."""
+    token_user_cache.invalidate(instance.key)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(instance, **kwargs):
+    """Смена пароля, деактивация и правка профиля."""
+    token_user_cache.invalidate_user(instance.pk)
+
+
+@receiver(connection_created)
+def register_sqlite_functions(connection, **kwargs):
+    """Функция CASEFOLD для поиска по названию (api.filters)."""
+    if connection.vendor == 'sqlite':
+        connection.connection.create_function(
+            Casefold.function, 1, casefold, deterministic=True
+        )
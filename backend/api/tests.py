@@ -0,0 +1,372 @@
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from recipes.models import (Ingredient, Recipe, RecipeIngredient,
+                            ShoppingListItem, Tag, User)
+
+from .authentication import token_user_cache
+from .filters import search_by_name
+
+# PNG 1x1 в формате Base64ImageField
+IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABAgMAAABieywa'
+    'AAAACVBMVEUAAAD///9fX1/S0ecCAAAACXBIWXMAAA7EAAAOxAGVKw4bAAAACklEQVQI'
+    'mWNoAAAAggCByxOyYQAAAABJRU5ErkJggg=='
+)
+
+
+def create_user(username, **kwargs):
+    return User.objects.create_user(
+        username=username, email=f'{username}@example.com',
+        password='password', first_name=username, last_name=username,
+        **kwargs
+    )
+
+
+@override_settings(TOKEN_SHARED_CACHE=True, TOKEN_LOCAL_CACHE=False)
+class TokenUserCacheTests(TestCase):
+
+    def setUp(self):
+        self.user = create_user('cached', is_staff=True)
+        self.key = Token.objects.create(user=self.user).key
+        token_user_cache.invalidate(self.key)
+        self.addCleanup(token_user_cache.invalidate, self.key)
+
+    def test_shared_cache_has_no_password(self):
+        token_user_cache.get_user(self.key)
+
+        stored = cache.get(token_user_cache.key_prefix + self.key)
+        self.assertEqual(stored, (self.user.pk, True, True, False))
+        self.assertNotIn(self.user.password, stored)
+
+    def test_user_built_from_cache(self):
+        token_user_cache.get_user(self.key)
+
+        with self.assertNumQueries(0):
+            user = token_user_cache.get_user(self.key)
+            self.assertEqual(user.pk, self.user.pk)
+            self.assertTrue(user.is_authenticated)
+            self.assertTrue(user.is_active)
+            self.assertTrue(user.is_staff)
+            self.assertFalse(user.is_superuser)
+        # Остальные поля отложены и читаются из БД
+        with self.assertNumQueries(1):
+            self.assertEqual(user.email, self.user.email)
+
+    def test_unknown_token(self):
+        self.assertIsNone(token_user_cache.get_user('unknown'))
+
+
+class SearchByNameTests(TestCase):
+
+    def test_case_insensitive_cyrillic(self):
+        for name in ('Молоко', 'сгущённое молоко', 'Мука', 'МОЛОКО топлёное'):
+            Ingredient.objects.create(name=name, measurement_unit='г')
+
+        with self.assertNumQueries(1):
+            names = [
+                ingredient.name for ingredient
+                in search_by_name(Ingredient.objects.all(), 'мОлОк')
+            ]
+        # Сначала совпадения с начала названия, внутри групп - по имени
+        self.assertEqual(
+            names, ['МОЛОКО топлёное', 'Молоко', 'сгущённое молоко']
+        )
+
+
+class RecipesAPITestCase(APITestCase):
+    """Пользователи, теги, ингредиенты и рецепты для тестов API."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        media_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        cls.addClassCleanup(media.disable)
+
+    def setUp(self):
+        self.user = create_user('user')
+        self.author = create_user('author')
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+        self.flour = Ingredient.objects.create(
+            name='мука', measurement_unit='г'
+        )
+        self.milk = Ingredient.objects.create(
+            name='молоко', measurement_unit='мл'
+        )
+        self.pancakes = self.create_recipe(
+            'Блины', {self.flour: 200, self.milk: 500}
+        )
+        self.bread = self.create_recipe('Хлеб', {self.flour: 400})
+
+    def create_recipe(self, name, amounts):
+        recipe = Recipe.objects.create(
+            author=self.author, name=name, text='Описание',
+            cooking_time=30, image='recipes/images/test.png'
+        )
+        recipe.tags.add(self.tag)
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe, ingredient=ingredient, amount=amount
+            )
+            for ingredient, amount in amounts.items()
+        )
+        return recipe
+
+    def recipe_data(self, name='Оладьи', **kwargs):
+        return {
+            'name': name,
+            'text': 'Описание',
+            'cooking_time': 20,
+            'image': IMAGE,
+            'tags': [self.tag.id],
+            'ingredients': [{'id': self.flour.id, 'amount': 100}],
+            **kwargs,
+        }
+
+
+class CountersAPITests(RecipesAPITestCase):
+
+    def assertCounter(self, obj, field, expected):
+        obj.refresh_from_db(fields=(field,))
+        self.assertEqual(getattr(obj, field), expected)
+
+    def test_favorites_count(self):
+        url = f'/api/recipes/{self.pancakes.id}/favorite/'
+        self.assertEqual(
+            self.client.post(url).status_code, status.HTTP_201_CREATED
+        )
+        self.assertCounter(self.pancakes, 'favorites_count', 1)
+        self.assertEqual(
+            self.client.post(url).status_code, status.HTTP_400_BAD_REQUEST
+        )
+        self.assertCounter(self.pancakes, 'favorites_count', 1)
+
+        self.assertEqual(
+            self.client.delete(url).status_code, status.HTTP_204_NO_CONTENT
+        )
+        self.assertCounter(self.pancakes, 'favorites_count', 0)
+
+    def test_favorites_count_bulk(self):
+        ids = [self.pancakes.id, self.bread.id]
+        self.client.post(f'/api/recipes/{self.bread.id}/favorite/')
+
+        response = self.client.post(
+            '/api/recipes/bulk/favorite/', {'ids': ids}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertCounter(self.pancakes, 'favorites_count', 1)
+        self.assertCounter(self.bread, 'favorites_count', 1)
+
+        response = self.client.delete(
+            '/api/recipes/bulk/favorite/', {'ids': ids}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertCounter(self.pancakes, 'favorites_count', 0)
+        self.assertCounter(self.bread, 'favorites_count', 0)
+
+    def test_subscribers_count(self):
+        url = f'/api/users/{self.author.id}/subscribe/'
+        self.assertEqual(
+            self.client.post(url).status_code, status.HTTP_201_CREATED
+        )
+        self.assertCounter(self.author, 'subscribers_count', 1)
+
+        self.assertEqual(
+            self.client.delete(url).status_code, status.HTTP_204_NO_CONTENT
+        )
+        self.assertCounter(self.author, 'subscribers_count', 0)
+
+    def test_recipes_count(self):
+        self.assertCounter(self.author, 'recipes_count', 2)
+
+        response = self.client.post(
+            '/api/recipes/', self.recipe_data(), format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertCounter(self.user, 'recipes_count', 1)
+
+        response = self.client.delete(f'/api/recipes/{response.data["id"]}/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertCounter(self.user, 'recipes_count', 0)
+
+
+class ShoppingListAPITests(RecipesAPITestCase):
+
+    def assertShoppingList(self, expected):
+        self.assertEqual(
+            dict(ShoppingListItem.objects.filter(
+                user=self.user
+            ).values_list('ingredient__name', 'amount')),
+            expected
+        )
+
+    def test_cart(self):
+        for recipe in (self.pancakes, self.bread):
+            response = self.client.post(
+                f'/api/recipes/{recipe.id}/shopping_cart/'
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertShoppingList({'мука': 600, 'молоко': 500})
+
+        response = self.client.delete(
+            f'/api/recipes/{self.pancakes.id}/shopping_cart/'
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertShoppingList({'мука': 400})
+
+    def test_cart_bulk(self):
+        ids = [self.pancakes.id, self.bread.id]
+        response = self.client.post(
+            '/api/recipes/bulk/shopping_cart/', {'ids': ids}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertShoppingList({'мука': 600, 'молоко': 500})
+
+        response = self.client.delete(
+            '/api/recipes/bulk/shopping_cart/', {'ids': ids}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertShoppingList({})
+
+    def test_recipe_update(self):
+        self.client.post(f'/api/recipes/{self.pancakes.id}/shopping_cart/')
+        self.client.force_authenticate(self.author)
+
+        response = self.client.patch(
+            f'/api/recipes/{self.pancakes.id}/',
+            {
+                'tags': [self.tag.id],
+                'ingredients': [{'id': self.flour.id, 'amount': 250}],
+            },
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertShoppingList({'мука': 250})
+
+        response = self.client.delete(f'/api/recipes/{self.pancakes.id}/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertShoppingList({})
+
+
+class ConditionalAPITests(RecipesAPITestCase):
+
+    def assertNotModified(self, url):
+        """Первый ответ даёт ETag, повтор с If-None-Match - 304."""
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        return etag
+
+    def assertModified(self, url, etag):
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_catalog(self):
+        url = f'/api/tags/{self.tag.id}/'
+        etag = self.assertNotModified(url)
+
+        self.tag.name = 'Ранний завтрак'
+        self.tag.save()
+        self.assertModified(url, etag)
+
+    def test_recipe(self):
+        url = f'/api/recipes/{self.pancakes.id}/'
+        etag = self.assertNotModified(url)
+
+        self.client.post(f'{url}favorite/')
+        self.assertModified(url, etag)
+
+    def test_recipes_list(self):
+        etag = self.assertNotModified('/api/recipes/')
+
+        self.client.post(f'/api/recipes/{self.bread.id}/shopping_cart/')
+        self.assertModified('/api/recipes/', etag)
+
+    def test_download_shopping_cart(self):
+        url = '/api/recipes/download_shopping_cart/'
+        self.client.post(f'/api/recipes/{self.bread.id}/shopping_cart/')
+        etag = self.assertNotModified(url)
+
+        self.client.post(f'/api/recipes/{self.pancakes.id}/shopping_cart/')
+        self.assertModified(url, etag)
+
+
+class BulkCreateAPITests(RecipesAPITestCase):
+    url = '/api/recipes/bulk/'
+
+    def setUp(self):
+        super().setUp()
+        self.recipes_count = Recipe.objects.count()
+
+    def assertCreated(self, count):
+        self.assertEqual(
+            Recipe.objects.count(), self.recipes_count + count
+        )
+        self.user.refresh_from_db(fields=('recipes_count',))
+        self.assertEqual(self.user.recipes_count, count)
+
+    def test_all_valid(self):
+        response = self.client.post(
+            self.url,
+            [self.recipe_data('Оладьи'), self.recipe_data('Сырники')],
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [item['status'] for item in response.data],
+            [status.HTTP_201_CREATED] * 2
+        )
+        self.assertCreated(2)
+
+    def test_strict_rejects_batch(self):
+        response = self.client.post(
+            self.url,
+            [self.recipe_data(), self.recipe_data(tags=[])],
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertCreated(0)
+
+    def test_partial(self):
+        response = self.client.post(
+            f'{self.url}?allow_partial=true',
+            [
+                self.recipe_data(tags=[]),
+                self.recipe_data('Сырники'),
+                self.recipe_data(cooking_time=0),
+            ],
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(
+            [item['status'] for item in response.data],
+            [
+                status.HTTP_400_BAD_REQUEST,
+                status.HTTP_201_CREATED,
+                status.HTTP_400_BAD_REQUEST,
+            ]
+        )
+        self.assertEqual(response.data[1]['recipe']['name'], 'Сырники')
+        self.assertCreated(1)
+
+    def test_partial_all_invalid(self):
+        response = self.client.post(
+            f'{self.url}?allow_partial=true',
+            [self.recipe_data(tags=[]), self.recipe_data(cooking_time=0)],
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertCreated(0)
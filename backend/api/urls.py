@@ -1,9 +1,11 @@
+from django.conf import settings
 from django.urls import include, path
 from django.views.static import serve
 from rest_framework.routers import DefaultRouter
 
 from foodgram_backend.settings import BASE_DIR
 
+from . import async_views, views
 from .views import (IngredientViewSet, RecipeViewSet, TagViewSet, UsersViewSet)
 
 DOCS_DIR = BASE_DIR.parent / 'docs'
@@ -17,6 +19,7 @@ router.register('recipes', RecipeViewSet, basename='recipes')
 urlpatterns = [
     path('auth/', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
+    path('stats/', views.runtime_stats, name='runtime-stats'),
     path('', include(router.urls)),
     path(
         'redoc/', serve,
@@ -29,3 +32,13 @@ urlpatterns = [
         name='redoc'
     ),
 ]
+
+if settings.ASYNC_READ_VIEWS:
+    # Асинхронные GET-обработчики перехватывают маршруты роутера
+    urlpatterns = [
+        path('tags/', async_views.tag_list),
+        path('tags/<int:pk>/', async_views.tag_detail),
+        path('ingredients/', async_views.ingredient_list),
+        path('ingredients/<int:pk>/', async_views.ingredient_detail),
+        path('recipes/<int:pk>/', async_views.recipe_detail),
+    ] + urlpatterns
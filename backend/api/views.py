@@ -1,34 +1,86 @@
+import os
+from hashlib import md5
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.db import connections, transaction
+from django.db.models import Exists, F, OuterRef, Prefetch, Value, Window
+from django.db.models.functions import RowNumber
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
 from django.views.decorators.http import require_http_methods
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from rest_framework import status, viewsets
-from rest_framework.decorators import action
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.filters import OrderingFilter
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 
-from recipes.models import (Ingredient, Recipe, RecipeIngredient, ShoppingCart,
-                            Tag)
+from foodgram_backend.middleware import InstrumentedViewMixin
+from recipes.counters import change_counter
+from recipes.models import (Favorite, Ingredient, Recipe, ShoppingCart,
+                            ShoppingListItem, Tag)
 from users.models import Subscription
 
+from .authentication import token_user_cache
+from .catalog import ingredients_snapshot, snapshot_response, tags_snapshot
+from .conditional import (catalog_version, make_etag, not_modified,
+                          recipe_versions, set_validators)
+from .constants import RECIPE_BATCH_MAX_SIZE, SHOPPING_LIST_CHUNK_SIZE
 from .filters import IngredientFilter, RecipeFilter
+from .pagination import RecipePagination
 from .permissions import IsOwnerOrReadOnly
-from .serializers import (CustomUserSerializer, FavoriteSerializer,
-                          IngredientSerializer, RecipeCreateSerializer,
-                          RecipeSerializer, ShoppingCartSerializer,
+from .relations import change_relations, lock_user
+from .renderers import (ShoppingListCSVRenderer, ShoppingListJSONRenderer,
+                        ShoppingListTextRenderer)
+from .search import ingredient_index
+from .serializers import (BulkIdsSerializer, CustomUserSerializer,
+                          FavoriteSerializer, IngredientSerializer,
+                          RecipeCreateSerializer, RecipeSerializer,
+                          RecipeShortSerializer, ShoppingCartSerializer,
                           SubscriptionCreateSerializer, SubscriptionSerializer,
                           TagSerializer)
+from .short_links import short_link_resolver
 
 User = get_user_model()
 
 
-class UsersViewSet(UserViewSet):
+class UsersViewSet(InstrumentedViewMixin, UserViewSet):
     """Кастомный ViewSet для пользователей."""
     serializer_class = CustomUserSerializer
     queryset = User.objects.all()
+    filter_backends = (OrderingFilter,)
+    ordering_fields = ('username', 'recipes_count', 'subscribers_count')
+
+    # Действия, которые сохраняют пользователя запроса целиком
+    # или проверяют его пароль (destroy - djoser UserDeleteSerializer)
+    user_writing_actions = (
+        'add_avatar', 'remove_avatar', 'set_password', 'set_username',
+        'destroy'
+    )
+
+    def initial(self, request, *args, **kwargs):
+        """
+        Перед записью пользователь запроса перечитывается из БД:
+        копия из кеша токенов может быть устаревшей, и её save()
+        затёр бы параллельные изменения, в том числе хеш пароля.
+        """
+        super().initial(request, *args, **kwargs)
+        if (
+            self.action in self.user_writing_actions
+            and request.user.is_authenticated
+        ):
+            request.user = User.objects.get(pk=request.user.pk)
+
+    def get_instance(self):
+        """
+        Профиль перечитывается из БД: пользователь запроса
+        может быть взят из кеша токенов с устаревшими счётчиками.
+        """
+        return User.objects.get(pk=self.request.user.pk)
 
     @action(
         detail=False,
@@ -87,17 +139,21 @@ class UsersViewSet(UserViewSet):
             context={'request': request}
         )
 
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
+        with transaction.atomic():
+            lock_user(request.user)
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @add_subscription.mapping.delete
     def remove_subscription(self, request, id=None):
         """Удаление подписки на пользователя."""
         author = get_object_or_404(User, pk=id)
-        deleted, _ = Subscription.objects.filter(
-            user=request.user, author=author
-        ).delete()
+        with transaction.atomic():
+            lock_user(request.user)
+            deleted, _ = Subscription.objects.filter(
+                user=request.user, author=author
+            ).delete()
 
         if not deleted:
             return Response(
@@ -107,6 +163,43 @@ class UsersViewSet(UserViewSet):
 
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(
+        detail=False,
+        methods=('post',),
+        url_path='bulk/subscribe',
+        permission_classes=(IsAuthenticated,)
+    )
+    def add_subscriptions(self, request):
+        """
+        Подписка на нескольких авторов: {"ids": [...]}.
+        Ответ - списки id: changed, unchanged и invalid
+        (нет такого пользователя или это сам пользователь).
+        """
+        return self._change_subscriptions(request, add=True)
+
+    @add_subscriptions.mapping.delete
+    def remove_subscriptions(self, request):
+        """Отписка от нескольких авторов: {"ids": [...]}."""
+        return self._change_subscriptions(request, add=False)
+
+    def _change_subscriptions(self, request, add):
+        serializer = BulkIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        def on_change(author_ids, sign):
+            # Удаление уменьшает счётчик сигналом post_delete
+            if sign > 0:
+                change_counter(
+                    User, 'subscribers_count',
+                    {author_id: sign for author_id in author_ids}
+                )
+
+        return Response(change_relations(
+            Subscription, request.user, 'author',
+            User.objects.exclude(pk=request.user.pk),
+            serializer.validated_data['ids'], add, on_change
+        ))
+
     @action(
         detail=False,
         methods=('get',),
@@ -116,25 +209,79 @@ class UsersViewSet(UserViewSet):
     def subscriptions(self, request):
         """Получение списка подписок пользователя."""
         user = request.user
+        recipes = Recipe.objects.all()
+        recipes_limit = SubscriptionSerializer.get_recipes_limit(request)
+        if recipes_limit:
+            # Первые recipes_limit рецептов каждого автора отбираются в БД
+            recipes = recipes.annotate(
+                row_number=Window(
+                    RowNumber(),
+                    partition_by=F('author'),
+                    order_by=(F('pub_date').desc(), F('id').desc()),
+                )
+            ).filter(row_number__lte=recipes_limit)
         authors = User.objects.filter(
             subscribers__user=user
-        ).prefetch_related('recipes')
-        page = self.paginate_queryset(authors)
+        ).prefetch_related(
+            Prefetch('recipes', queryset=recipes)
+        )
+        page = self.paginate_queryset(self.filter_queryset(authors))
         serializer = SubscriptionSerializer(
             page, many=True, context={'request': request}
         )
         return self.get_paginated_response(serializer.data)
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class CatalogConditionalMixin:
+    """
+    ETag / Last-Modified для справочников: версия меняется
+    при любом изменении тегов или ингредиентов.
+    Полный список в JSON отдаётся готовым снимком catalog_snapshot.
+    """
+    catalog_snapshot = None
+
+    def is_unfiltered(self, request):
+        return True
+
+    def conditional(self, view, request, *args, **kwargs):
+        version = catalog_version()
+        etag = make_etag(
+            request.accepted_renderer.format,
+            request.get_full_path(),
+            version
+        )
+        response = not_modified(request, etag, version, vary=())
+        if response is None:
+            response = view(request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                set_validators(response, etag, version, vary=())
+        return response
+
+    def list(self, request, *args, **kwargs):
+        if (
+            self.catalog_snapshot is not None
+            and request.accepted_renderer.format == 'json'
+            and self.is_unfiltered(request)
+        ):
+            return snapshot_response(request, self.catalog_snapshot.get())
+        return self.conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(super().retrieve, request, *args, **kwargs)
+
+
+class TagViewSet(InstrumentedViewMixin, CatalogConditionalMixin,
+                 viewsets.ReadOnlyModelViewSet):
     """ViewSet для работы с тегами."""
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (AllowAny,)
     pagination_class = None
+    catalog_snapshot = tags_snapshot
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(InstrumentedViewMixin, CatalogConditionalMixin,
+                        viewsets.ReadOnlyModelViewSet):
     """ViewSet для работы с ингредиентами."""
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
@@ -142,14 +289,65 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
     pagination_class = None
+    catalog_snapshot = ingredients_snapshot
+
+    def is_unfiltered(self, request):
+        return not request.query_params.get('name')
+
+    def list(self, request, *args, **kwargs):
+        """Поиск по названию обслуживается индексом без обращения к БД."""
+        name = request.query_params.get('name')
+        if name and settings.INGREDIENT_SEARCH_BACKEND == 'memory':
+            return self.conditional(
+                lambda request: Response(ingredient_index.search(name)),
+                request
+            )
+        return super().list(request, *args, **kwargs)
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(InstrumentedViewMixin, viewsets.ModelViewSet):
     """ViewSet для работы с рецептами."""
     queryset = Recipe.objects.all()
     permission_classes = (IsOwnerOrReadOnly,)
-    filter_backends = (DjangoFilterBackend,)
+    filter_backends = (DjangoFilterBackend, OrderingFilter)
     filterset_class = RecipeFilter
+    ordering_fields = ('pub_date', 'favorites_count')
+    pagination_class = RecipePagination
+
+    def get_queryset(self):
+        """
+        Рецепты с заранее вычисленными флагами текущего пользователя.
+        Автор, теги и ингредиенты подгружаются фиксированным числом
+        запросов, независимо от размера страницы.
+        """
+        user = self.request.user
+        if not user.is_authenticated:
+            return Recipe.objects.select_related('author').prefetch_related(
+                'tags', 'recipe_ingredients__ingredient'
+            ).annotate(
+                is_favorited=Value(False),
+                is_in_shopping_cart=Value(False),
+            )
+
+        # Автор загружается через Prefetch, чтобы признак подписки
+        # был аннотирован прямо на объекте пользователя.
+        authors = User.objects.annotate(
+            is_subscribed=Exists(Subscription.objects.filter(
+                user=user, author=OuterRef('pk')
+            ))
+        )
+        return Recipe.objects.prefetch_related(
+            Prefetch('author', queryset=authors),
+            'tags',
+            'recipe_ingredients__ingredient',
+        ).annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+        )
 
     def get_serializer_class(self):
         """Выбор сериализатора в зависимости от действия."""
@@ -157,6 +355,106 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return RecipeCreateSerializer
         return RecipeSerializer
 
+    def list(self, request, *args, **kwargs):
+        """
+        Сначала страница выбирается по строкам с версиями рецептов:
+        при совпадении ETag ответ 304 отдаётся без загрузки связей
+        и сериализации.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        versions = self.paginate_queryset(
+            recipe_versions(queryset, request.user)
+        )
+        etag = make_etag(
+            request.accepted_renderer.format,
+            request.user.pk,
+            catalog_version(),
+            self.paginator.get_page_info(),
+            [tuple(row.values()) for row in versions],
+        )
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+
+        ids = [row['id'] for row in versions]
+        recipes = queryset.in_bulk(ids)
+        serializer = self.get_serializer(
+            [recipes[pk] for pk in ids if pk in recipes], many=True
+        )
+        response = self.get_paginated_response(serializer.data)
+        return set_validators(response, etag)
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            version = recipe_versions(
+                self.get_queryset().filter(pk=kwargs['pk']), request.user
+            ).first()
+        except (TypeError, ValueError):
+            version = None
+        if version is None:
+            # Ответ 404 формирует обычный get_object
+            return super().retrieve(request, *args, **kwargs)
+        etag = make_etag(
+            request.accepted_renderer.format,
+            request.user.pk,
+            catalog_version(),
+            tuple(version.values()),
+        )
+        response = not_modified(request, etag)
+        if response is None:
+            response = set_validators(
+                super().retrieve(request, *args, **kwargs), etag
+            )
+        return response
+
+    @action(
+        detail=False,
+        methods=('post',),
+        permission_classes=(IsAuthenticated,),
+        url_path='bulk',
+    )
+    def bulk_create(self, request):
+        """
+        Пакетное создание рецептов: тело - список рецептов в формате
+        POST /api/recipes/. По умолчанию при ошибке в любом элементе
+        не создаётся ничего; с ?allow_partial=true создаются
+        корректные рецепты. Ответ - результат по каждому элементу.
+        """
+        allow_partial = request.query_params.get(
+            'allow_partial', ''
+        ).lower() in ('1', 'true')
+        serializer = RecipeCreateSerializer(
+            data=request.data,
+            many=True,
+            allow_empty=False,
+            max_length=RECIPE_BATCH_MAX_SIZE,
+            context={**self.get_serializer_context(),
+                     'allow_partial': allow_partial},
+        )
+        serializer.is_valid(raise_exception=True)
+        recipes = serializer.save()
+
+        context = self.get_serializer_context()
+        created = iter(recipes)
+        results = [
+            {'status': status.HTTP_400_BAD_REQUEST, 'errors': errors}
+            if errors else
+            {
+                'status': status.HTTP_201_CREATED,
+                'recipe': RecipeShortSerializer(
+                    next(created), context=context
+                ).data,
+            }
+            for errors in serializer.item_errors
+        ]
+        return Response(
+            results,
+            status=(
+                status.HTTP_207_MULTI_STATUS if any(serializer.item_errors)
+                else status.HTTP_201_CREATED
+            )
+        )
+
     def _add_recipe_to_list(self, serializer_class, request, pk):
         """Общий метод для добавления рецепта в список."""
         context = {'request': request}
@@ -165,9 +463,12 @@ class RecipeViewSet(viewsets.ModelViewSet):
             data={'user': request.user.id, 'recipe': recipe.id},
             context=context
         )
-        serializer.is_valid(raise_exception=True)
-
-        serializer.save()
+        with transaction.atomic():
+            # Проверка и вставка - под той же блокировкой,
+            # что и у пакетных операций (api.relations)
+            lock_user(request.user)
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def _remove_recipe_from_list(self, serializer_class, request, pk):
@@ -176,9 +477,11 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
         model = serializer_class.Meta.model
 
-        deleted_count, _ = model.objects.filter(
-            user=request.user, recipe=recipe
-        ).delete()
+        with transaction.atomic():
+            lock_user(request.user)
+            deleted_count, _ = model.objects.filter(
+                user=request.user, recipe=recipe
+            ).delete()
 
         if not deleted_count:
             return Response(
@@ -187,6 +490,67 @@ class RecipeViewSet(viewsets.ModelViewSet):
             )
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    def _change_recipes_in_list(self, model, request, add):
+        """
+        Общий метод пакетного изменения списка рецептов: {"ids": [...]}.
+        Ответ - списки id: changed, unchanged и invalid.
+        """
+        serializer = BulkIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = request.user
+
+        def on_change(recipe_ids, sign):
+            # Вставка идёт в обход сигналов; удаление учитывают
+            # сигналы pre_delete/post_delete (recipes.signals)
+            if sign < 0:
+                return
+            if model is ShoppingCart:
+                ShoppingListItem.objects.change_recipes(
+                    user, recipe_ids, sign
+                )
+            else:
+                change_counter(
+                    Recipe, 'favorites_count',
+                    {recipe_id: sign for recipe_id in recipe_ids}
+                )
+
+        return Response(change_relations(
+            model, user, 'recipe', Recipe.objects.all(),
+            serializer.validated_data['ids'], add, on_change
+        ))
+
+    @action(
+        detail=False,
+        methods=('post',),
+        permission_classes=(IsAuthenticated,),
+        url_path='bulk/favorite',
+    )
+    def add_favorites(self, request):
+        """Добавление нескольких рецептов в избранное."""
+        return self._change_recipes_in_list(Favorite, request, add=True)
+
+    @add_favorites.mapping.delete
+    def remove_favorites(self, request):
+        """Удаление нескольких рецептов из избранного."""
+        return self._change_recipes_in_list(Favorite, request, add=False)
+
+    @action(
+        detail=False,
+        methods=('post',),
+        permission_classes=(IsAuthenticated,),
+        url_path='bulk/shopping_cart',
+    )
+    def add_to_shopping_cart_bulk(self, request):
+        """Добавление нескольких рецептов в список покупок."""
+        return self._change_recipes_in_list(ShoppingCart, request, add=True)
+
+    @add_to_shopping_cart_bulk.mapping.delete
+    def remove_from_shopping_cart_bulk(self, request):
+        """Удаление нескольких рецептов из списка покупок."""
+        return self._change_recipes_in_list(
+            ShoppingCart, request, add=False
+        )
+
     @action(
         detail=True,
         methods=('post',),
@@ -214,9 +578,6 @@ class RecipeViewSet(viewsets.ModelViewSet):
     )
     def add_to_shopping_cart(self, request, pk=None):
         """Добавление рецепта в список покупок."""
-        print("DEBUG: Вызван add_to_shopping_cart")
-        print(f"DEBUG: request.user = {request.user}, pk = {pk}")
-        print(f"DEBUG: request.data = {request.data}")
         return self._add_recipe_to_list(
             ShoppingCartSerializer, request, pk
         )
@@ -233,33 +594,56 @@ class RecipeViewSet(viewsets.ModelViewSet):
         methods=('get',),
         permission_classes=(IsAuthenticated,),
         url_path='download_shopping_cart',
+        renderer_classes=(
+            ShoppingListTextRenderer,
+            ShoppingListCSVRenderer,
+            ShoppingListJSONRenderer,
+        ),
     )
     def download_shopping_cart(self, request):
-        """Скачивание списка покупок."""
-        shopping_cart = ShoppingCart.objects.filter(user=request.user)
-        recipes = shopping_cart.values_list('recipe_id', flat=True)
-
-        # Собираем ингредиенты с их общим количеством
-        ingredients = (
-            RecipeIngredient.objects.filter(recipe_id__in=recipes)
-            .values('ingredient__name', 'ingredient__measurement_unit')
-            .annotate(total_amount=Sum('amount'))
+        """
+        Скачивание списка покупок.
+        Формат выбирается параметром ?format=txt|csv|json
+        (по умолчанию txt), список отдаётся потоком.
+        """
+        shopping_list = ShoppingListItem.objects.filter(user=request.user)
+
+        # Сигнатура - сами позиции списка и версия справочников:
+        # меняется при изменении количества, состава, названий
+        # или единиц измерения.
+        renderer = request.accepted_renderer
+        signature = md5(
+            f'{renderer.format}:{catalog_version()}'.encode(),
+            usedforsecurity=False
         )
-
-        purchased = ['Список покупок:']
-        for item in ingredients:
-            purchased.append(
-                f"{item['ingredient__name']}: {item['total_amount']} "
-                f"{item['ingredient__measurement_unit']}"
+        for ingredient_id, amount in shopping_list.order_by(
+            'ingredient_id'
+        ).values_list('ingredient_id', 'amount').iterator(
+            chunk_size=SHOPPING_LIST_CHUNK_SIZE
+        ):
+            signature.update(f'{ingredient_id}:{amount};'.encode())
+        etag = quote_etag(signature.hexdigest())
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+
+        items = (
+            shopping_list.values(
+                name=F('ingredient__name'),
+                measurement_unit=F('ingredient__measurement_unit'),
+                total_amount=F('amount'),
             )
-
-        # Создаем HTTP-ответ
-        content = "\n".join(purchased)
-        response = HttpResponse(content, content_type='text/plain')
-        response[
-            'Content-Disposition'
-        ] = 'attachment; filename=shopping-list.txt'
-
+            .order_by('name', 'measurement_unit')
+            .iterator(chunk_size=SHOPPING_LIST_CHUNK_SIZE)
+        )
+        response = StreamingHttpResponse(
+            renderer.render_stream(items),
+            content_type=f'{renderer.media_type}; charset=utf-8'
+        )
+        response['ETag'] = etag
+        response['Content-Disposition'] = (
+            f'attachment; filename=shopping-list.{renderer.format}'
+        )
         return response
 
     @action(
@@ -278,8 +662,28 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return Response({"short-link": short_url}, status=status.HTTP_200_OK)
 
 
+@api_view(('GET',))
+@permission_classes((IsAdminUser,))
+def runtime_stats(request):
+    """
+    Метрики кешей и пулов соединений процесса, обработавшего запрос.
+    У каждого процесса сервера свои значения.
+    """
+    return Response({
+        'pid': os.getpid(),
+        'token_cache': token_user_cache.stats(),
+        'db_pools': {
+            alias: connections[alias].pool_stats()
+            for alias in connections
+            if hasattr(connections[alias], 'pool_stats')
+        },
+    })
+
+
 @require_http_methods(['GET'])
 def redirect_short_link(request, short_link):
     """Переадресовывает на оригинальный рецепт."""
-    recipe = get_object_or_404(Recipe, short_link=short_link)
-    return redirect(f'/recipes/{recipe.id}')
+    recipe_id = short_link_resolver.resolve(short_link)
+    if recipe_id is None:
+        raise Http404('Рецепт не найден.')
+    return redirect(f'/recipes/{recipe_id}')
@@ -0,0 +1,52 @@
+"""
+Сравнение WSGI- и ASGI-развёртываний на эндпоинтах чтения.
+
+    python -m benchmarks.async_read --wsgi http://127.0.0.1:8000 \
+        --asgi http://127.0.0.1:8001 --concurrency 50 --duration 20
+"""
+import argparse
+import json
+
+import requests
+
+from .load import run
+
+READ_PATHS = (
+    '/api/tags/',
+    '/api/ingredients/?name=мук',
+    '/api/ingredients/1/',
+)
+
+
+def read_requests(base_url):
+    paths = list(READ_PATHS)
+    recipes = requests.get(f'{base_url}/api/recipes/?limit=20').json()
+    for recipe in recipes.get('results', []):
+        paths.append(f'/api/recipes/{recipe["id"]}/')
+    return [('GET', base_url + path) for path in paths]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--wsgi', help='Адрес WSGI-сервера.')
+    parser.add_argument('--asgi', help='Адрес ASGI-сервера.')
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--token', help='Токен для авторизованных запросов.')
+    args = parser.parse_args()
+    headers = {'Authorization': f'Token {args.token}'} if args.token else {}
+    results = {}
+    for name in ('wsgi', 'asgi'):
+        base_url = getattr(args, name)
+        if base_url:
+            results[name] = run(
+                read_requests(base_url.rstrip('/')),
+                concurrency=args.concurrency,
+                duration=args.duration,
+                headers=headers,
+            )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,444 @@
+"""
+Задержки и число SQL-запросов по маршрутам API.
+
+Запросы выполняются в процессе через тестовый клиент Django
+против настроенной БД (заполненной seed_fake_data), без сети.
+Результат сравнивается с сохранённым JSON-базисом: рост числа
+запросов или задержки (по умолчанию p50: p95 на малой выборке
+слишком шумный) сверх порога - ошибка (код выхода 1).
+
+    python -m benchmarks.endpoints              # сравнить с базисом
+    python -m benchmarks.endpoints --update     # записать новый базис
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from urllib.parse import quote
+
+from .load import percentile
+
+BASELINES_DIR = Path(__file__).resolve().parent / 'baselines'
+
+# Запросы сверх базиса, которые не считаются регрессией
+QUERY_SLACK = 0
+# Допустимый относительный рост задержки и минимальный абсолютный (мс),
+# ниже которого разница считается шумом
+LATENCY_TOLERANCE = 0.5
+LATENCY_MIN_DELTA_MS = 5.0
+
+# Фильтры ленты рецептов; замеряются все их сочетания
+RECIPE_FILTERS = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart',
+                  'name')
+# Размер пакета в замерах пакетных маршрутов
+BULK_SIZE = 20
+# Префикс названий рецептов, создаваемых замером пакетного создания
+BULK_RECIPE_PREFIX = 'benchmark-bulk'
+# Картинка 1x2 для пакетного создания рецептов
+BULK_RECIPE_IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABAgMAAABieywaAAAAC'
+    'VBMVEUAAAD///9fX1/S0ecCAAAACXBIWXMAAA7EAAAOxAGVKw4bAAAACklEQVQImWNoAAAA'
+    'ggCByxOyYQAAAABJRU5ErkJggg=='
+)
+
+
+def setup_django():
+    os.environ.setdefault(
+        'DJANGO_SETTINGS_MODULE', 'foodgram_backend.settings'
+    )
+    # Выборочные замеры middleware искажали бы задержки
+    os.environ.setdefault('REQUEST_INSTRUMENTATION', 'False')
+    # Как и фоновая обработка картинок созданных рецептов: она идёт
+    # в замере пакетного создания, а не во время следующих маршрутов
+    os.environ.setdefault('IMAGE_PROCESSING_WORKERS', '0')
+    import django
+    from django.test.utils import setup_test_environment
+
+    django.setup()
+    # Разрешает хост testserver тестового клиента
+    setup_test_environment()
+
+
+def pick_fixtures():
+    """Пользователь и объекты, на которых строятся URL замеров."""
+    from django.contrib.auth import get_user_model
+    from django.db.models import Count, F, Q
+    from rest_framework.authtoken.models import Token
+
+    from recipes.models import Ingredient, Recipe, Tag
+
+    User = get_user_model()
+    recipe = Recipe.objects.order_by('-favorites_count', 'pk').first()
+    # Самый «нагруженный» пользователь. Подписки, корзина и избранное
+    # (кроме рецепта замеров, его убирает prepare) не должны быть
+    # пустыми, иначе маршруты замеряются на пустом ответе
+    user = User.objects.alias(
+        subscriptions_total=Count('subscriptions', distinct=True),
+        cart_total=Count(
+            'shoppingcart', filter=~Q(shoppingcart__recipe=recipe),
+            distinct=True
+        ),
+        favorites_total=Count(
+            'favorite', filter=~Q(favorite__recipe=recipe), distinct=True
+        ),
+    ).filter(
+        subscriptions_total__gt=0, cart_total__gt=0, favorites_total__gt=0
+    ).order_by(
+        -(F('subscriptions_total') + F('cart_total') + F('favorites_total')),
+        'pk'
+    ).first()
+    author = User.objects.order_by('-recipes_count', 'pk').first()
+    tags = list(Tag.objects.order_by('pk'))
+    ingredient = Ingredient.objects.order_by('pk').first()
+    if None in (user, recipe, author, ingredient) or not tags:
+        raise SystemExit(
+            'Нет данных для замеров: выполните import_csv и seed_fake_data.'
+        )
+    # Пакетные маршруты добавляют и убирают связи, которых у
+    # пользователя нет, и так возвращают данные в исходное состояние
+    bulk_recipes = list(
+        Recipe.objects.exclude(pk=recipe.pk)
+        .exclude(favorite__user=user).exclude(shoppingcart__user=user)
+        .order_by('pk').values_list('pk', flat=True)[:BULK_SIZE]
+    )
+    bulk_authors = list(
+        User.objects.exclude(pk=user.pk).exclude(subscribers__user=user)
+        .order_by('pk').values_list('pk', flat=True)[:BULK_SIZE]
+    )
+    return {
+        'token': Token.objects.get_or_create(user=user)[0].key,
+        'user': user,
+        'recipe': recipe,
+        'author': author,
+        'tags': tags,
+        'ingredient': ingredient,
+        'search': ingredient.name[:3].lower(),
+        'recipe_word': recipe.name.split()[0].lower(),
+        'bulk_recipes': bulk_recipes,
+        'bulk_authors': bulk_authors,
+    }
+
+
+def recipe_filter_params(fixtures, names):
+    params = []
+    for name in names:
+        if name == 'tags':
+            params += [f'tags={tag.slug}' for tag in fixtures['tags'][:2]]
+        elif name == 'author':
+            params.append(f'author={fixtures["author"].pk}')
+        elif name == 'name':
+            params.append(f'name={quote(fixtures["recipe_word"])}')
+        else:
+            params.append(f'{name}=1')
+    return '&'.join(params)
+
+
+def bulk_recipe_data(fixtures):
+    """Тело пакетного создания: BULK_SIZE рецептов с одной картинкой."""
+    return [
+        {
+            'name': f'{BULK_RECIPE_PREFIX} {number}',
+            'text': 'Рецепт замера пакетного создания.',
+            'cooking_time': 10,
+            'image': BULK_RECIPE_IMAGE,
+            'tags': [tag.pk for tag in fixtures['tags'][:2]],
+            'ingredients': [{'id': fixtures['ingredient'].pk, 'amount': 1}],
+        }
+        for number in range(BULK_SIZE)
+    ]
+
+
+def build_routes(fixtures):
+    """
+    Маршруты замеров: (имя, метод, путь, авторизован[, тело]).
+    Пары POST/DELETE возвращают данные в исходное состояние,
+    созданные пакетом рецепты удаляет cleanup.
+    """
+    recipe = fixtures['recipe']
+    recipe_ids = {'ids': fixtures['bulk_recipes']}
+    author_ids = {'ids': fixtures['bulk_authors']}
+    routes = [
+        ('tags list', 'get', '/api/tags/', False),
+        ('tag detail', 'get', f'/api/tags/{fixtures["tags"][0].pk}/', False),
+        ('ingredients list', 'get', '/api/ingredients/', False),
+        ('ingredients search', 'get',
+         f'/api/ingredients/?name={quote(fixtures["search"])}', False),
+        ('ingredient detail', 'get',
+         f'/api/ingredients/{fixtures["ingredient"].pk}/', False),
+        ('recipes list anon', 'get', '/api/recipes/', False),
+        ('recipes list cursor', 'get',
+         '/api/recipes/?pagination=cursor', True),
+        ('recipe detail anon', 'get', f'/api/recipes/{recipe.pk}/', False),
+        ('recipe detail', 'get', f'/api/recipes/{recipe.pk}/', True),
+        ('recipe get-link', 'get',
+         f'/api/recipes/{recipe.pk}/get-link/', False),
+        ('short link redirect', 'get', f'/r/{recipe.short_link}/', False),
+        ('users list', 'get', '/api/users/', True),
+        ('user detail', 'get',
+         f'/api/users/{fixtures["author"].pk}/', True),
+        ('users me', 'get', '/api/users/me/', True),
+        ('subscriptions', 'get', '/api/users/subscriptions/', True),
+        ('subscriptions recipes_limit', 'get',
+         '/api/users/subscriptions/?recipes_limit=3', True),
+        ('download shopping cart', 'get',
+         '/api/recipes/download_shopping_cart/', True),
+        ('favorite add', 'post', f'/api/recipes/{recipe.pk}/favorite/', True),
+        ('favorite remove', 'delete',
+         f'/api/recipes/{recipe.pk}/favorite/', True),
+        ('shopping cart add', 'post',
+         f'/api/recipes/{recipe.pk}/shopping_cart/', True),
+        ('shopping cart remove', 'delete',
+         f'/api/recipes/{recipe.pk}/shopping_cart/', True),
+        ('bulk favorite add', 'post',
+         '/api/recipes/bulk/favorite/', True, recipe_ids),
+        ('bulk favorite remove', 'delete',
+         '/api/recipes/bulk/favorite/', True, recipe_ids),
+        ('bulk shopping cart add', 'post',
+         '/api/recipes/bulk/shopping_cart/', True, recipe_ids),
+        ('bulk shopping cart remove', 'delete',
+         '/api/recipes/bulk/shopping_cart/', True, recipe_ids),
+        ('bulk subscribe', 'post',
+         '/api/users/bulk/subscribe/', True, author_ids),
+        ('bulk unsubscribe', 'delete',
+         '/api/users/bulk/subscribe/', True, author_ids),
+        ('recipes bulk create', 'post',
+         '/api/recipes/bulk/', True, bulk_recipe_data(fixtures)),
+    ]
+    for size in range(len(RECIPE_FILTERS) + 1):
+        for names in itertools.combinations(RECIPE_FILTERS, size):
+            if not names:
+                continue
+            routes.append((
+                f'recipes list [{", ".join(names)}]', 'get',
+                f'/api/recipes/?{recipe_filter_params(fixtures, names)}',
+                True
+            ))
+    return routes
+
+
+def prepare(fixtures):
+    """Убирает рецепт замеров из избранного и корзины пользователя."""
+    from recipes.models import Favorite, ShoppingCart
+
+    user, recipe = fixtures['user'], fixtures['recipe']
+    Favorite.objects.filter(user=user, recipe=recipe).delete()
+    ShoppingCart.objects.filter(user=user, recipe=recipe).delete()
+    cleanup()
+
+
+def cleanup():
+    """Удаляет рецепты, созданные замером пакетного создания, и их картинки."""
+    from django.core.files.storage import default_storage
+
+    from recipes.models import Recipe
+
+    recipes = Recipe.objects.filter(name__startswith=BULK_RECIPE_PREFIX)
+    for image in recipes.values_list('image', flat=True).iterator():
+        default_storage.delete(image)
+    recipes.delete()
+
+
+def is_empty(response):
+    """Список (или страница списка) в ответе пуст."""
+    data = getattr(response, 'data', None)
+    if isinstance(data, dict) and 'results' in data:
+        data = data['results']
+    return isinstance(data, list) and not data
+
+
+def measure(routes, token, iterations, warmup):
+    """
+    Для каждого маршрута: p50/p95 (мс), число запросов, статус и
+    пустой ли ответ. Потоковый ответ читается целиком внутри замера:
+    его запросы выполняются при чтении.
+    Число запросов - самое частое за итерации: истечение кешей
+    (например, токенов) изредка добавляет запрос.
+    """
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from rest_framework.test import APIClient
+
+    anonymous = APIClient()
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+    samples = {name: [] for name, *_ in routes}
+    queries = {name: Counter() for name, *_ in routes}
+    statuses = {}
+    empty = {}
+    for iteration in range(warmup + iterations):
+        for name, method, path, authorized, *body in routes:
+            request = getattr(client if authorized else anonymous, method)
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                if body:
+                    response = request(path, body[0], format='json')
+                else:
+                    response = request(path)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                elapsed = time.perf_counter() - started
+            if iteration < warmup:
+                continue
+            samples[name].append(elapsed)
+            queries[name][len(captured)] += 1
+            statuses[name] = response.status_code
+            empty[name] = is_empty(response)
+    return {
+        name: {
+            'p50': round(percentile(samples[name], 0.50) * 1000, 2),
+            'p95': round(percentile(samples[name], 0.95) * 1000, 2),
+            'queries': queries[name].most_common(1)[0][0],
+            'status': statuses[name],
+            'empty': empty[name],
+        }
+        for name in samples
+    }
+
+
+def dataset():
+    """Размер данных, на которых сняты замеры."""
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+
+    from recipes.models import Favorite, Recipe, ShoppingCart
+
+    return {
+        'vendor': connection.vendor,
+        'users': get_user_model().objects.count(),
+        'recipes': Recipe.objects.count(),
+        'favorites': Favorite.objects.count(),
+        'shopping_carts': ShoppingCart.objects.count(),
+    }
+
+
+def compare(results, baseline, query_slack, tolerance, min_delta,
+            latency='p50'):
+    """Список регрессий относительно базиса."""
+    regressions = []
+    for name, current in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            # Маршрут не замерен при записи базиса (например, --skip)
+            regressions.append(f'{name}: нет в базисе')
+            continue
+        if current['status'] != expected['status']:
+            regressions.append(
+                f'{name}: статус {current["status"]}, '
+                f'в базисе {expected["status"]}'
+            )
+        if current['queries'] > expected['queries'] + query_slack:
+            regressions.append(
+                f'{name}: запросов {current["queries"]}, '
+                f'в базисе {expected["queries"]}'
+            )
+        delta = current[latency] - expected[latency]
+        if delta > min_delta and delta > expected[latency] * tolerance:
+            regressions.append(
+                f'{name}: {latency} {current[latency]} мс, '
+                f'в базисе {expected[latency]} мс'
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument(
+        '--baseline',
+        help='Файл базиса (по умолчанию baselines/endpoints-<СУБД>.json).'
+    )
+    parser.add_argument(
+        '--update', action='store_true', help='Записать новый базис.'
+    )
+    parser.add_argument('--only', help='Замерять маршруты с этой подстрокой.')
+    parser.add_argument(
+        '--skip', help='Не замерять маршруты с этой подстрокой.'
+    )
+    parser.add_argument('--query-slack', type=int, default=QUERY_SLACK)
+    parser.add_argument(
+        '--latency-tolerance', type=float, default=LATENCY_TOLERANCE
+    )
+    parser.add_argument(
+        '--latency-min-delta', type=float, default=LATENCY_MIN_DELTA_MS
+    )
+    parser.add_argument(
+        '--latency-percentile', choices=('p50', 'p95'), default='p50'
+    )
+    args = parser.parse_args()
+
+    setup_django()
+    fixtures = pick_fixtures()
+    routes = build_routes(fixtures)
+    if args.only:
+        routes = [route for route in routes if args.only in route[0]]
+    if args.skip:
+        routes = [route for route in routes if args.skip not in route[0]]
+    prepare(fixtures)
+    info = dataset()
+    try:
+        results = measure(
+            routes, fixtures['token'], args.iterations, args.warmup
+        )
+    finally:
+        cleanup()
+
+    width = max(len(name) for name in results)
+    for name, result in results.items():
+        print(
+            f'{name:<{width}}  {result["status"]}  '
+            f'queries={result["queries"]:<3} '
+            f'p50={result["p50"]:>8} ms  p95={result["p95"]:>8} ms'
+        )
+
+    path = Path(
+        args.baseline or BASELINES_DIR / f'endpoints-{info["vendor"]}.json'
+    )
+    for name, result in results.items():
+        if result['empty']:
+            print(f'Внимание: {name}: пустой ответ')
+    if args.update:
+        failed = [
+            name for name, result in results.items()
+            if result['status'] >= 500
+        ]
+        if failed:
+            raise SystemExit(
+                f'Базис не записан, ошибки сервера: {", ".join(failed)}'
+            )
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(
+            {'dataset': info, 'results': results},
+            ensure_ascii=False, indent=2
+        ) + '\n', encoding='utf-8')
+        print(f'Базис записан: {path}')
+        return
+    if not path.exists():
+        print(f'Базис {path} не найден, запустите с --update.')
+        return
+    baseline = json.loads(path.read_text(encoding='utf-8'))
+    if baseline['dataset'] != info:
+        print(
+            'Внимание: данные отличаются от базиса: '
+            f'{baseline["dataset"]} != {info}'
+        )
+    regressions = compare(
+        results, baseline['results'], args.query_slack,
+        args.latency_tolerance, args.latency_min_delta,
+        args.latency_percentile
+    )
+    for regression in regressions:
+        print(f'РЕГРЕССИЯ {regression}')
+    if regressions:
+        sys.exit(1)
+    print('Регрессий нет.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Простой многопоточный генератор HTTP-нагрузки."""
+import threading
+import time
+
+import requests
+
+
+def percentile(values, share):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def summarize(latencies, errors, elapsed):
+    """Сводка по замерам: задержки в миллисекундах."""
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else 0,
+        'p50': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99': round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+def run(requests_list, concurrency=10, duration=10, headers=None):
+    """
+    Выполняет запросы из requests_list по кругу в concurrency потоках
+    в течение duration секунд. Элемент списка - (метод, url)
+    или (метод, url, json-тело).
+    """
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(offset):
+        nonlocal errors
+        session = requests.Session()
+        session.headers.update(headers or {})
+        position = offset
+        while time.perf_counter() < deadline:
+            method, url, *body = requests_list[
+                position % len(requests_list)
+            ]
+            position += 1
+            started = time.perf_counter()
+            try:
+                response = session.request(
+                    method, url, json=body[0] if body else None,
+                    allow_redirects=False
+                )
+                failed = response.status_code >= 500
+            except requests.RequestException:
+                failed = True
+            latency = time.perf_counter() - started
+            with lock:
+                latencies.append(latency)
+                errors += failed
+
+    started = time.perf_counter()
+    threads = [
+        threading.Thread(target=worker, args=(offset,))
+        for offset in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(latencies, errors, time.perf_counter() - started)
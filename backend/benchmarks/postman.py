@@ -0,0 +1,349 @@
+"""
+Нагрузка сценарием postman-коллекции: регистрация, токены, рецепты,
+избранное, корзина, подписки. Каждый виртуальный пользователь
+проходит коллекцию по порядку в своём потоке, со своими
+переменными и уникальными email/username на каждой итерации.
+
+    python -m benchmarks.postman --base-url http://127.0.0.1:8000 \
+        --users 20 --duration 60
+
+Тестовые скрипты коллекции не выполняются: из них берутся только
+ожидаемый статус ответа и сохраняемые в переменные поля ответа.
+Ошибка - ответ с другим статусом или сбой соединения.
+"""
+import argparse
+import json
+import re
+import threading
+import time
+import uuid
+from collections import Counter, namedtuple
+from http import HTTPStatus
+from pathlib import Path
+
+import requests
+
+from .load import summarize
+
+COLLECTION = (
+    Path(__file__).resolve().parents[2]
+    / 'postman_collection' / 'foodgram.postman_collection.json'
+)
+
+# Переменные, которые должны быть уникальны для каждой итерации
+UNIQUE_VARIABLES = (
+    'username', 'email',
+    'secondUserUsername', 'secondUserEmail',
+    'thirdUserUsername', 'thirdUserEmail',
+)
+# Папки с проверками ошибок; по умолчанию не входят в нагрузку
+BAD_REQUESTS_MARKER = 'bad_requests'
+
+VARIABLE = re.compile(r'\{\{(\w+)\}\}')
+STATUS_PHRASES = {status.phrase: status.value for status in HTTPStatus}
+EXPECTED_STATUS = re.compile(
+    r'pm\.response\.status,.*?\)\.to\.be\.eql\(\s*["\']([^"\']+)["\']',
+    re.S
+)
+SET_VARIABLE = re.compile(
+    r'pm\.collectionVariables\.set\(\s*["\'](\w+)["\']\s*,\s*([^;\n]+?)\)'
+    r'\s*;?\s*$',
+    re.M
+)
+GET_FIELD = re.compile(
+    r'const (\w+) = _\.get\(responseData,\s*["\'](\w+)["\']\)'
+)
+RESPONSE_PATH = re.compile(
+    r'^responseData((?:\[\d+\]|\.\w+)*?)(?:\.slice\((\d+),\s*(\d+)\))?$'
+)
+
+Step = namedtuple(
+    'Step', 'name method url headers body expected_status extract'
+)
+
+
+def script_source(item):
+    sources = []
+    for event in item.get('event', ()):
+        lines = event.get('script', {}).get('exec', ())
+        sources.append(lines if isinstance(lines, str) else '\n'.join(lines))
+    return '\n'.join(sources)
+
+
+def parse_extract(source):
+    """
+    Поля ответа, которые скрипт сохраняет в переменные:
+    [(переменная, путь в JSON, срез строки или None)].
+    """
+    fields = dict(GET_FIELD.findall(source))
+    extract = []
+    for variable, expression in SET_VARIABLE.findall(source):
+        expression = expression.strip()
+        if expression in fields:
+            extract.append((variable, (fields[expression],), None))
+            continue
+        match = RESPONSE_PATH.match(expression)
+        if match is None:
+            continue
+        path = tuple(
+            int(part[1:-1]) if part.startswith('[') else part[1:]
+            for part in re.findall(r'\[\d+\]|\.\w+', match.group(1))
+        )
+        cut = (
+            (int(match.group(2)), int(match.group(3)))
+            if match.group(2) else None
+        )
+        extract.append((variable, path, cut))
+    return extract
+
+
+def auth_headers(auth):
+    """Заголовки для авторизации типа apikey (остальные не нужны)."""
+    if not auth or auth.get('type') != 'apikey':
+        return {}
+    options = {entry['key']: entry['value'] for entry in auth['apikey']}
+    return {options['key']: options['value']}
+
+
+def iter_steps(items, auth=None, with_bad_requests=False):
+    for item in items:
+        # Авторизация наследуется от ближайшей папки, где она задана
+        item_auth = item.get('auth', auth)
+        if 'item' in item:
+            if BAD_REQUESTS_MARKER in item['name'] and not with_bad_requests:
+                continue
+            yield from iter_steps(item['item'], item_auth, with_bad_requests)
+            continue
+        request = item['request']
+        item_auth = request.get('auth', item_auth)
+        url = request['url']
+        headers = {
+            header['key']: header['value']
+            for header in request.get('header', ())
+            if not header.get('disabled')
+        }
+        headers.update(auth_headers(item_auth))
+        body = request.get('body', {})
+        if body.get('mode') == 'raw':
+            headers.setdefault('Content-Type', 'application/json')
+        source = script_source(item)
+        expected = EXPECTED_STATUS.search(source)
+        yield Step(
+            name=item['name'],
+            method=request['method'],
+            url=url['raw'] if isinstance(url, dict) else url,
+            headers=headers,
+            body=body.get('raw') if body.get('mode') == 'raw' else None,
+            expected_status=(
+                STATUS_PHRASES.get(expected.group(1)) if expected else None
+            ),
+            extract=parse_extract(source),
+        )
+
+
+def load_collection(path=COLLECTION, folders=None, with_bad_requests=False):
+    """Шаги коллекции по порядку и её переменные."""
+    with open(path, encoding='utf-8') as file:
+        collection = json.load(file)
+    items = collection['item']
+    if folders:
+        items = [item for item in items if item['name'] in folders]
+    variables = {
+        variable['key']: variable['value']
+        for variable in collection.get('variable', ())
+    }
+    return (
+        list(iter_steps(items, collection.get('auth'), with_bad_requests)),
+        variables
+    )
+
+
+def render(template, variables):
+    return VARIABLE.sub(
+        lambda match: str(variables.get(match.group(1), match.group(0))),
+        template
+    )
+
+
+def make_unique(value, suffix):
+    """Добавляет суффикс к username или к локальной части email."""
+    quoted = value.startswith('"') and value.endswith('"')
+    value = value.strip('"')
+    if '@' in value:
+        local, domain = value.split('@', 1)
+        value = f'{local}.{suffix}@{domain}'
+    else:
+        value = f'{value}-{suffix}'
+    return f'"{value}"' if quoted else value
+
+
+def extract_value(data, path, cut):
+    for key in path:
+        data = data[key]
+    return data[cut[0]:cut[1]] if cut else data
+
+
+def execute(session, step, variables):
+    """Выполняет шаг; возвращает (задержка, статус, успех)."""
+    started = time.perf_counter()
+    try:
+        response = session.request(
+            step.method,
+            render(step.url, variables),
+            headers={
+                key: render(value, variables)
+                for key, value in step.headers.items()
+            },
+            data=(
+                render(step.body, variables).encode('utf-8')
+                if step.body is not None else None
+            ),
+            allow_redirects=False,
+        )
+    except requests.RequestException as error:
+        return time.perf_counter() - started, type(error).__name__, False
+    latency = time.perf_counter() - started
+    if step.expected_status is not None:
+        ok = response.status_code == step.expected_status
+    else:
+        ok = response.status_code < HTTPStatus.BAD_REQUEST
+    if ok and step.extract:
+        try:
+            data = response.json()
+            for variable, path, cut in step.extract:
+                variables[variable] = extract_value(data, path, cut)
+        except (ValueError, LookupError, TypeError):
+            ok = False
+    return latency, response.status_code, ok
+
+
+def run(steps, variables, users=10, duration=60, iterations=0,
+        think_time=0):
+    """
+    Запускает users виртуальных пользователей на duration секунд
+    (или на iterations проходов коллекции каждым).
+    Возвращает сводку по именам запросов и общую сводку.
+    """
+    run_id = uuid.uuid4().hex[:6]
+    samples = {}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def record(name, latency, status, ok):
+        with lock:
+            latencies, statuses, errors = samples.setdefault(
+                name, ([], Counter(), [0])
+            )
+            latencies.append(latency)
+            statuses[status] += 1
+            errors[0] += not ok
+
+    def virtual_user(number):
+        session = requests.Session()
+        iteration = 0
+        while time.perf_counter() < deadline and (
+            not iterations or iteration < iterations
+        ):
+            suffix = f'{run_id}{number}n{iteration}'
+            scope = dict(variables)
+            for name in UNIQUE_VARIABLES:
+                if name in scope:
+                    scope[name] = make_unique(scope[name], suffix)
+            for step in steps:
+                if time.perf_counter() >= deadline:
+                    return
+                record(step.name, *execute(session, step, scope))
+                if think_time:
+                    time.sleep(think_time)
+            iteration += 1
+
+    started = time.perf_counter()
+    threads = [
+        threading.Thread(target=virtual_user, args=(number,))
+        for number in range(users)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    results = {}
+    all_latencies, all_errors = [], 0
+    for name, (latencies, statuses, errors) in samples.items():
+        results[name] = summarize(latencies, errors[0], elapsed)
+        results[name]['error_rate'] = round(errors[0] / len(latencies), 4)
+        results[name]['statuses'] = dict(statuses)
+        all_latencies += latencies
+        all_errors += errors[0]
+    total = summarize(all_latencies, all_errors, elapsed)
+    total['error_rate'] = (
+        round(all_errors / len(all_latencies), 4) if all_latencies else 0
+    )
+    return results, total
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument('--collection', default=COLLECTION)
+    parser.add_argument(
+        '--base-url', help='Адрес сервера вместо baseUrl из коллекции.'
+    )
+    parser.add_argument(
+        '--users', type=int, default=10,
+        help='Число виртуальных пользователей (потоков).'
+    )
+    parser.add_argument('--duration', type=float, default=60)
+    parser.add_argument(
+        '--iterations', type=int, default=0,
+        help='Проходов коллекции на пользователя (0 - пока идёт время).'
+    )
+    parser.add_argument(
+        '--think-time', type=float, default=0,
+        help='Пауза между запросами пользователя, с.'
+    )
+    parser.add_argument(
+        '--folders',
+        help='Только эти папки верхнего уровня (через запятую).'
+    )
+    parser.add_argument(
+        '--with-bad-requests', action='store_true',
+        help='Включить папки с проверками ошибочных запросов.'
+    )
+    parser.add_argument('--json', help='Сохранить результаты в файл.')
+    args = parser.parse_args()
+
+    steps, variables = load_collection(
+        args.collection,
+        folders=args.folders.split(',') if args.folders else None,
+        with_bad_requests=args.with_bad_requests,
+    )
+    if args.base_url:
+        variables['baseUrl'] = args.base_url.rstrip('/')
+    results, total = run(
+        steps, variables, users=args.users, duration=args.duration,
+        iterations=args.iterations, think_time=args.think_time,
+    )
+
+    width = max(len(name) for name in results) if results else 0
+    for name, result in results.items():
+        print(
+            f'{name:<{width}}  n={result["requests"]:<6} '
+            f'rps={result["rps"]:<7} p50={result["p50"]:>8} '
+            f'p95={result["p95"]:>8} p99={result["p99"]:>8} ms  '
+            f'errors={result["error_rate"]:.2%}'
+            + (f' {result["statuses"]}' if result['errors'] else '')
+        )
+    print(json.dumps({'total': total}, indent=2))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(
+                {'total': total, 'requests': results}, file,
+                ensure_ascii=False, indent=2
+            )
+
+
+if __name__ == '__main__':
+    main()
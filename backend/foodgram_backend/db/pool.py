@@ -0,0 +1,227 @@
+"""
+Пул соединений с БД, общий для потоков одного процесса.
+Не зависит от драйвера: соединения создаёт фабрика connect,
+проверку и сброс состояния выполняют функции check и reset.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    """Свободное соединение не появилось за отведённое время."""
+
+
+class ConnectionPool:
+    """
+    Пул на min_size..max_size соединений.
+    - Если все соединения заняты, getconn ждёт до timeout секунд.
+    - Соединение старше max_lifetime секунд закрывается при возврате.
+    - Соединение, простоявшее дольше check_interval секунд,
+      перед выдачей проверяется функцией check.
+    - Вместо закрытых соединений открываются новые до min_size.
+    """
+
+    def __init__(self, connect, min_size=0, max_size=10, timeout=10,
+                 max_lifetime=None, check_interval=None,
+                 check=None, reset=None):
+        self.connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.check_interval = check_interval
+        self.check = check
+        self.reset = reset
+        self._idle = deque()
+        self._created_at = {}
+        self._size = 0
+        self._in_use = 0
+        self._condition = threading.Condition()
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time': 0.0,
+            'max_wait_time': 0.0,
+            'timeouts': 0,
+            'created': 0,
+            'closed': 0,
+            'failed_checks': 0,
+        }
+
+    def fill(self):
+        """Открывает соединения до min_size."""
+        while True:
+            with self._condition:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            connection = self._open()
+            with self._condition:
+                self._idle.append((connection, time.monotonic()))
+                self._condition.notify()
+
+    def _open(self):
+        try:
+            connection = self.connect()
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._created_at[id(connection)] = time.monotonic()
+            self._stats['created'] += 1
+        return connection
+
+    def _discard(self, connection):
+        with self._condition:
+            self._created_at.pop(id(connection), None)
+            self._size -= 1
+            self._stats['closed'] += 1
+            self._condition.notify()
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _expired(self, connection):
+        created_at = self._created_at.get(id(connection))
+        return (
+            self.max_lifetime is not None and created_at is not None
+            and time.monotonic() - created_at > self.max_lifetime
+        )
+
+    def getconn(self):
+        """Выдаёт соединение из пула, при необходимости открывая новое."""
+        started = time.monotonic()
+        deadline = started + self.timeout
+        waited = False
+        while True:
+            connection = None
+            with self._condition:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise PoolTimeout(
+                            f'Нет свободных соединений за {self.timeout} с.'
+                        )
+                    waited = True
+                    self._condition.wait(remaining)
+                if self._idle:
+                    # LIFO: первыми выдаются недавно использованные
+                    connection, released_at = self._idle.pop()
+                else:
+                    self._size += 1
+                self._in_use += 1
+            if connection is None:
+                try:
+                    connection = self._open()
+                except Exception:
+                    with self._condition:
+                        self._in_use -= 1
+                    raise
+            elif self._failed_check(connection, released_at):
+                with self._condition:
+                    self._in_use -= 1
+                    self._stats['failed_checks'] += 1
+                self._discard(connection)
+                continue
+            break
+        wait_time = time.monotonic() - started
+        with self._condition:
+            self._stats['checkouts'] += 1
+            self._stats['waits'] += waited
+            self._stats['wait_time'] += wait_time
+            self._stats['max_wait_time'] = max(
+                self._stats['max_wait_time'], wait_time
+            )
+        return connection
+
+    def _failed_check(self, connection, released_at):
+        if self.check is None or self.check_interval is None:
+            return False
+        if time.monotonic() - released_at < self.check_interval:
+            return False
+        try:
+            return not self.check(connection)
+        except Exception:
+            return True
+
+    def putconn(self, connection):
+        """Возвращает соединение в пул (или закрывает его)."""
+        with self._condition:
+            self._in_use -= 1
+        try:
+            usable = self.reset is None or self.reset(connection)
+        except Exception:
+            usable = False
+        if not usable or self._expired(connection):
+            self._discard(connection)
+            self.fill()
+            return
+        with self._condition:
+            self._idle.append((connection, time.monotonic()))
+            self._condition.notify()
+
+    def closeall(self):
+        with self._condition:
+            idle = list(self._idle)
+            self._idle.clear()
+        for connection, _ in idle:
+            self._discard(connection)
+
+    def stats(self):
+        """Метрики пула; время - в миллисекундах."""
+        with self._condition:
+            stats = dict(self._stats)
+            stats.update(
+                size=self._size,
+                in_use=self._in_use,
+                idle=len(self._idle),
+                min_size=self.min_size,
+                max_size=self.max_size,
+            )
+        checkouts = stats['checkouts'] or 1
+        stats['avg_wait_time'] = round(
+            stats['wait_time'] / checkouts * 1000, 3
+        )
+        stats['wait_time'] = round(stats['wait_time'] * 1000, 3)
+        stats['max_wait_time'] = round(stats['max_wait_time'] * 1000, 3)
+        return stats
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+# Соединения, унаследованные от родителя при fork. Их нельзя закрывать
+# в дочернем процессе (сокет общий), поэтому ссылки просто хранятся.
+_inherited = []
+
+
+def get_pool(key, factory):
+    """Пул процесса по ключу; factory() создаёт пул при первом обращении."""
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = factory()
+                _pools[key] = pool
+    return pool
+
+
+def all_pools():
+    return dict(_pools)
+
+
+def _reset_after_fork():
+    global _pools_lock
+    _inherited.extend(_pools.values())
+    _pools.clear()
+    _pools_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
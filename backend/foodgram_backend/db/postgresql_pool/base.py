@@ -0,0 +1,104 @@
+"""
+PostgreSQL с пулом соединений процесса.
+Django по-прежнему закрывает соединение в конце запроса
+(CONN_MAX_AGE = 0), но оно возвращается в пул, а не рвётся.
+Параметры пула задаются в DATABASES[...]['POOL'].
+"""
+from functools import partial
+
+from django.db.backends.postgresql import base, creation
+from psycopg2 import extensions
+
+from ..pool import ConnectionPool, all_pools, get_pool
+
+POOL_DEFAULTS = {
+    'MIN_SIZE': 0,
+    'MAX_SIZE': 10,
+    'TIMEOUT': 10,
+    'MAX_LIFETIME': 30 * 60,
+    'CHECK_INTERVAL': 30,
+}
+
+
+def check_connection(connection):
+    """Проверка соединения, простоявшего в пуле."""
+    if connection.closed:
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+    return True
+
+
+def reset_connection(connection):
+    """
+    Откатывает незавершённую транзакцию перед возвратом в пул.
+    Соединение в неизвестном состоянии в пул не возвращается.
+    """
+    if connection.closed:
+        return False
+    status = connection.info.transaction_status
+    if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+        return False
+    if status != extensions.TRANSACTION_STATUS_IDLE:
+        connection.rollback()
+    return True
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # Простаивающие соединения пула мешают удалить тестовую БД
+        for pool in all_pools().values():
+            pool.closeall()
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    @property
+    def pool(self):
+        return get_pool(self.pool_key(), self.create_pool)
+
+    def pool_key(self):
+        params = self.get_connection_params()
+        return (self.alias,) + tuple(
+            sorted((key, str(value)) for key, value in params.items())
+        )
+
+    def create_pool(self):
+        options = {**POOL_DEFAULTS, **self.settings_dict.get('POOL', {})}
+        # Соединения открываются так же, как у обычного бэкенда
+        pool = ConnectionPool(
+            connect=partial(
+                base.DatabaseWrapper.get_new_connection,
+                self,
+                self.get_connection_params()
+            ),
+            min_size=options['MIN_SIZE'],
+            max_size=options['MAX_SIZE'],
+            timeout=options['TIMEOUT'],
+            max_lifetime=options['MAX_LIFETIME'],
+            check_interval=options['CHECK_INTERVAL'],
+            check=check_connection,
+            reset=reset_connection,
+        )
+        pool.fill()
+        return pool
+
+    def get_new_connection(self, conn_params):
+        connection = self.pool.getconn()
+        isolation_level = self.settings_dict['OPTIONS'].get('isolation_level')
+        self.isolation_level = base.IsolationLevel(
+            base.IsolationLevel.READ_COMMITTED
+            if isolation_level is None else isolation_level
+        )
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.putconn(self.connection)
+
+    def pool_stats(self):
+        return self.pool.stats()
@@ -0,0 +1,115 @@
+from threading import Timer
+from unittest import TestCase, mock
+
+from .pool import ConnectionPool, PoolTimeout
+from .postgresql_pool.base import DatabaseWrapper
+
+
+class FakeConnection:
+    """Соединение без БД: пул только открывает, проверяет и закрывает."""
+
+    def __init__(self):
+        self.closed = False
+        self.broken = False
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(**kwargs):
+    return ConnectionPool(
+        connect=FakeConnection,
+        check=lambda connection: not connection.broken,
+        reset=lambda connection: not connection.closed,
+        **kwargs
+    )
+
+
+class ConnectionPoolTests(TestCase):
+
+    def test_exhausted_pool_times_out(self):
+        pool = make_pool(max_size=1, timeout=0.05)
+        pool.getconn()
+        with self.assertRaises(PoolTimeout):
+            pool.getconn()
+        stats = pool.stats()
+        self.assertEqual(stats['timeouts'], 1)
+        self.assertEqual(stats['size'], 1)
+        self.assertEqual(stats['in_use'], 1)
+
+    def test_released_connection_unblocks_waiter(self):
+        pool = make_pool(max_size=1, timeout=5)
+        connection = pool.getconn()
+        timer = Timer(0.05, pool.putconn, (connection,))
+        timer.start()
+        self.addCleanup(timer.cancel)
+
+        self.assertIs(pool.getconn(), connection)
+        stats = pool.stats()
+        self.assertEqual(stats['created'], 1)
+        self.assertEqual(stats['waits'], 1)
+
+    def test_broken_connection_is_discarded(self):
+        pool = make_pool(max_size=1, check_interval=0)
+        connection = pool.getconn()
+        pool.putconn(connection)
+        connection.broken = True
+
+        replacement = pool.getconn()
+        self.assertIsNot(replacement, connection)
+        self.assertTrue(connection.closed)
+        stats = pool.stats()
+        self.assertEqual(stats['failed_checks'], 1)
+        self.assertEqual(stats['closed'], 1)
+        self.assertEqual(stats['size'], 1)
+
+    def test_closed_connection_is_not_returned(self):
+        pool = make_pool(min_size=1, max_size=2)
+        pool.fill()
+        connection = pool.getconn()
+        connection.close()
+        pool.putconn(connection)
+
+        stats = pool.stats()
+        self.assertEqual(stats['in_use'], 0)
+        self.assertEqual(stats['closed'], 1)
+        # Вместо закрытого открыто новое соединение до min_size
+        self.assertEqual(stats['idle'], 1)
+        self.assertIsNot(pool.getconn(), connection)
+
+    def test_expired_connection_is_closed_on_return(self):
+        pool = make_pool(max_size=1, max_lifetime=0)
+        connection = pool.getconn()
+        pool.putconn(connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats()['idle'], 0)
+
+
+class DatabaseWrapperTests(TestCase):
+
+    def setUp(self):
+        self.pool = make_pool(max_size=1, timeout=0.05)
+        patcher = mock.patch.object(
+            DatabaseWrapper, 'pool', new_callable=mock.PropertyMock,
+            return_value=self.pool
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.wrapper = DatabaseWrapper({
+            'NAME': 'test', 'OPTIONS': {}, 'TIME_ZONE': None,
+            'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False,
+            'AUTOCOMMIT': True, 'ATOMIC_REQUESTS': False,
+        })
+
+    def test_close_returns_connection_to_pool(self):
+        connection = self.wrapper.get_new_connection({})
+        self.assertEqual(self.pool.stats()['in_use'], 1)
+
+        self.wrapper.connection = connection
+        self.wrapper._close()
+
+        stats = self.pool.stats()
+        self.assertFalse(connection.closed)
+        self.assertEqual(stats['in_use'], 0)
+        self.assertEqual(stats['idle'], 1)
+        self.assertIs(self.wrapper.get_new_connection({}), connection)
@@ -0,0 +1,179 @@
+"""
+Замеры запросов: число и время SQL, повторяющиеся запросы (N+1),
+время обработчика представления DRF и полное время ответа. Результат отдаётся
+заголовком Server-Timing и строкой лога; медленные запросы
+дополнительно пишутся в отдельный лог вместе с SQL.
+"""
+import asyncio
+import json
+import logging
+import random
+import time
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.utils.decorators import sync_and_async_middleware
+
+logger = logging.getLogger(__name__)
+slow_logger = logging.getLogger(f'{__name__}.slow')
+
+# Замер текущего запроса; None, если запрос не попал в выборку
+current_metrics = ContextVar('request_metrics', default=None)
+
+# Сколько запросов SQL показывать в логе медленных запросов
+SLOW_REQUEST_SQL_LIMIT = 10
+
+
+class RequestMetrics:
+    """Накопленные за запрос замеры."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = []
+        self.view_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        """execute_wrapper: время каждого SQL-запроса."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - started))
+
+    def summary(self):
+        total = time.perf_counter() - self.started
+        fingerprints = Counter(sql for sql, _ in self.queries)
+        duplicates = {
+            sql: count for sql, count in fingerprints.items() if count > 1
+        }
+        top_sql, top_count = (
+            fingerprints.most_common(1)[0] if duplicates else (None, 0)
+        )
+        return {
+            'total_ms': round(total * 1000, 2),
+            'sql_count': len(self.queries),
+            'sql_ms': round(sum(d for _, d in self.queries) * 1000, 2),
+            'view_ms': round(self.view_time * 1000, 2),
+            'duplicate_sql': sum(duplicates.values()) - len(duplicates),
+            'n_plus_one': top_count,
+            'n_plus_one_sql': top_sql,
+        }
+
+
+class InstrumentedViewMixin:
+    """
+    Примесь к представлениям DRF: время обработчика (выборка,
+    сериализация, обработка ошибок) от конца initial() - проверки
+    прав и лимитов - до finalize_response(). SQL обработчика входит
+    в это время и отдельно учитывается в sql_ms.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.handler_started = time.perf_counter()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        metrics = current_metrics.get()
+        started = getattr(self, 'handler_started', None)
+        if metrics is not None and started is not None:
+            metrics.view_time += time.perf_counter() - started
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+def server_timing(summary):
+    header = []
+    if 'sql_ms' in summary:
+        header.append(
+            f'db;dur={summary["sql_ms"]};'
+            f'desc="{summary["sql_count"]} queries"'
+        )
+    header += [
+        f'view;dur={summary["view_ms"]}',
+        f'total;dur={summary["total_ms"]}',
+    ]
+    if summary.get('n_plus_one'):
+        header.append(f'dup;desc="x{summary["n_plus_one"]}"')
+    return ', '.join(header)
+
+
+def report(request, response, metrics, summary, options):
+    """Заголовок Server-Timing, строка лога и лог медленных запросов."""
+    if options['SERVER_TIMING']:
+        response['Server-Timing'] = server_timing(summary)
+    line = {
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+        **summary,
+    }
+    logger.info(json.dumps(line, ensure_ascii=False))
+    if summary['total_ms'] >= options['SLOW_REQUEST_MS']:
+        slowest = sorted(
+            metrics.queries, key=lambda query: query[1], reverse=True
+        )[:SLOW_REQUEST_SQL_LIMIT]
+        slow_logger.warning(json.dumps({
+            **line,
+            'slowest_sql': [
+                {'sql': sql, 'ms': round(duration * 1000, 2)}
+                for sql, duration in slowest
+            ],
+        }, ensure_ascii=False))
+
+
+@sync_and_async_middleware
+def request_instrumentation_middleware(get_response):
+    """
+    Настройки - словарь REQUEST_INSTRUMENTATION:
+    ENABLED, SAMPLE_RATE (доля замеряемых запросов), PATHS (префиксы
+    URL), SLOW_REQUEST_MS (порог лога медленных запросов) и
+    SERVER_TIMING (отдавать ли заголовок).
+    В асинхронном режиме SQL выполняется в других потоках
+    и не замеряется.
+    """
+    options = settings.REQUEST_INSTRUMENTATION
+    paths = tuple(options['PATHS'])
+
+    def sampled(request):
+        return (
+            options['ENABLED']
+            and request.path.startswith(paths)
+            and random.random() < options['SAMPLE_RATE']
+        )
+
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            if not sampled(request):
+                return await get_response(request)
+            metrics = RequestMetrics()
+            token = current_metrics.set(metrics)
+            try:
+                response = await get_response(request)
+            finally:
+                current_metrics.reset(token)
+            summary = metrics.summary()
+            for key in ('sql_count', 'sql_ms', 'duplicate_sql',
+                        'n_plus_one', 'n_plus_one_sql'):
+                del summary[key]
+            report(request, response, metrics, summary, options)
+            return response
+    else:
+        def middleware(request):
+            if not sampled(request):
+                return get_response(request)
+            metrics = RequestMetrics()
+            token = current_metrics.set(metrics)
+            try:
+                with ExitStack() as stack:
+                    for connection in connections.all():
+                        stack.enter_context(
+                            connection.execute_wrapper(metrics)
+                        )
+                    response = get_response(request)
+            finally:
+                current_metrics.reset(token)
+            report(request, response, metrics, metrics.summary(), options)
+            return response
+    return middleware
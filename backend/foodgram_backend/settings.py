@@ -42,6 +42,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'foodgram_backend.middleware.request_instrumentation_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     # 'corsheaders.middleware.CorsMiddleware',
@@ -77,17 +78,62 @@ WSGI_APPLICATION = 'foodgram_backend.wsgi.application'
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
 
+# DB_POOL включает пул соединений процесса (foodgram_backend.db).
+# Без пула соединения можно держать открытыми через DB_CONN_MAX_AGE.
+DB_POOL = os.getenv('DB_POOL', 'False').lower() in ('true', '1', 'yes')
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': (
+            'foodgram_backend.db.postgresql_pool' if DB_POOL
+            else 'django.db.backends.postgresql'
+        ),
         'NAME': os.getenv('POSTGRES_DB', 'django'),
         'USER': os.getenv('POSTGRES_USER', 'django'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', 'localhost'),
-        'PORT': os.getenv('DB_PORT', '5432')
+        'PORT': os.getenv('DB_PORT', '5432'),
+        'CONN_MAX_AGE': 0 if DB_POOL else int(os.getenv('DB_CONN_MAX_AGE', 0)),
+        'CONN_HEALTH_CHECKS': True,
+        'POOL': {
+            'MIN_SIZE': int(os.getenv('DB_POOL_MIN_SIZE', 1)),
+            'MAX_SIZE': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+            'TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+            'MAX_LIFETIME': float(os.getenv('DB_POOL_MAX_LIFETIME', 1800)),
+            'CHECK_INTERVAL': float(os.getenv('DB_POOL_CHECK_INTERVAL', 30)),
+        },
+    }
+}
+
+# Cache
+# По умолчанию - кеш в памяти процесса. Для общего кеша между
+# процессами задайте CACHE_BACKEND и CACHE_LOCATION
+# (например, django.core.cache.backends.memcached.PyMemcacheCache).
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
     }
 }
 
+# Использовать общий кеш для коротких ссылок (api.short_links)
+SHORT_LINK_SHARED_CACHE = os.getenv(
+    'SHORT_LINK_SHARED_CACHE', 'False'
+).lower() in ('true', '1', 'yes')
+
+# Использовать общий кеш для токенов (api.authentication)
+TOKEN_SHARED_CACHE = os.getenv(
+    'TOKEN_SHARED_CACHE', 'False'
+).lower() in ('true', '1', 'yes')
+# Кеш токенов в памяти процесса: без него (вместе с общим кешем)
+# выход и смена пароля сразу видны всем процессам
+TOKEN_LOCAL_CACHE = os.getenv(
+    'TOKEN_LOCAL_CACHE', 'True'
+).lower() in ('true', '1', 'yes')
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -130,6 +176,43 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'backend_static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'backend_media')
 
+# Обработка картинок рецептов (recipes.images): число фоновых потоков
+# (0 - обрабатывать сразу после коммита в том же потоке)
+# и генерация WebP-копий.
+IMAGE_PROCESSING_WORKERS = int(os.getenv('IMAGE_PROCESSING_WORKERS', 2))
+IMAGE_WEBP = os.getenv('IMAGE_WEBP', 'True').lower() in ('true', '1', 'yes')
+
+# Асинхронные обработчики чтения (только при запуске через ASGI)
+ASYNC_READ_VIEWS = os.getenv(
+    'ASYNC_READ_VIEWS', 'False'
+).lower() in ('true', '1', 'yes')
+
+# Замеры запросов (foodgram_backend.middleware), по умолчанию выключены
+REQUEST_INSTRUMENTATION = {
+    'ENABLED': os.getenv(
+        'REQUEST_INSTRUMENTATION', 'False'
+    ).lower() in ('true', '1', 'yes'),
+    'SAMPLE_RATE': float(os.getenv('REQUEST_SAMPLE_RATE', 0.01)),
+    'PATHS': os.getenv('REQUEST_INSTRUMENTATION_PATHS', '/api/').split(','),
+    'SLOW_REQUEST_MS': float(os.getenv('SLOW_REQUEST_MS', 500)),
+    'SERVER_TIMING': True,
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'foodgram_backend.middleware': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -144,7 +227,7 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
 
     'DEFAULT_PAGINATION_CLASS': 'api.pagination.CustomPagination',
@@ -152,6 +235,12 @@ REST_FRAMEWORK = {
 
 }
 
+# Поиск ингредиентов по названию:
+# memory - индекс в памяти процесса (api.search),
+# database - запрос к БД (api.filters.search_by_name), на PostgreSQL
+# по триграммному индексу.
+INGREDIENT_SEARCH_BACKEND = os.getenv('INGREDIENT_SEARCH_BACKEND', 'memory')
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
     'SEND_ACTIVATION_EMAIL': False,
@@ -3,7 +3,12 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
-from api.views import redirect_short_link
+from api import async_views, views
+
+if settings.ASYNC_READ_VIEWS:
+    redirect_short_link = async_views.redirect_short_link
+else:
+    redirect_short_link = views.redirect_short_link
 
 urlpatterns = [
     path('admin/', admin.site.urls),
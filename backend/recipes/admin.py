@@ -1,5 +1,6 @@
 from django.contrib import admin
 
+from .admin_filters import AuthorUsernameFilter, UsernameFilter
 from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
                      ShoppingCart, Tag)
 
@@ -8,24 +9,25 @@ class RecipeIngredientInline(admin.TabularInline):
     model = RecipeIngredient
     extra = 1
     min_num = 1
+    autocomplete_fields = ('ingredient',)
 
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
     list_display = ('name', 'author', 'favorites_count')
-    list_filter = ('tags', 'author', 'pub_date')
+    list_filter = ('tags', AuthorUsernameFilter, 'pub_date')
+    list_select_related = ('author',)
     search_fields = ('name', 'author__username')
+    autocomplete_fields = ('author', 'tags')
     inlines = (RecipeIngredientInline,)
     readonly_fields = ('pub_date', 'favorites_count')
-
-    @admin.display(description='В избранном')
-    def favorites_count(self, obj):
-        return obj.favorite.count()
+    show_full_result_count = False
 
 
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
     list_display = ('name', 'slug')
+    search_fields = ('name', 'slug')
     prepopulated_fields = {'slug': ('name',)}
 
 
@@ -35,11 +37,21 @@ class IngredientAdmin(admin.ModelAdmin):
     search_fields = ('name',)
 
 
-@admin.register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
+class BaseUserRecipeRelationAdmin(admin.ModelAdmin):
+    """Общие настройки для избранного и списка покупок."""
     list_display = ('user', 'recipe')
+    list_filter = (UsernameFilter,)
+    list_select_related = ('user', 'recipe__author')
+    autocomplete_fields = ('user', 'recipe')
+    ordering = ('user_id', 'recipe_id')
+    show_full_result_count = False
+
+
+@admin.register(Favorite)
+class FavoriteAdmin(BaseUserRecipeRelationAdmin):
+    pass
 
 
 @admin.register(ShoppingCart)
-class ShoppingCartAdmin(admin.ModelAdmin):
-    list_display = ('user', 'recipe')
+class ShoppingCartAdmin(BaseUserRecipeRelationAdmin):
+    pass
@@ -0,0 +1,43 @@
+from django.contrib import admin
+
+
+class InputFilter(admin.SimpleListFilter):
+    """
+    Фильтр списка с полем ввода.
+    Подходит для полей с большим числом значений (пользователи),
+    для которых стандартный фильтр выводит все варианты.
+    """
+    template = 'admin/input_filter.html'
+    lookup = None
+
+    def lookups(self, request, model_admin):
+        # Непустой список нужен, чтобы фильтр отображался
+        return ((None, None),)
+
+    def choices(self, changelist):
+        all_choice = next(super().choices(changelist))
+        all_choice['query_parts'] = (
+            (key, value)
+            for key, value in changelist.get_filters_params().items()
+            if key != self.parameter_name
+        )
+        yield all_choice
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{self.lookup: self.value()})
+        return queryset
+
+
+class UsernameFilter(InputFilter):
+    """Фильтр по username пользователя."""
+    title = 'пользователю (username)'
+    parameter_name = 'username'
+    lookup = 'user__username'
+
+
+class AuthorUsernameFilter(InputFilter):
+    """Фильтр по username автора."""
+    title = 'автору (username)'
+    parameter_name = 'author_username'
+    lookup = 'author__username'
@@ -10,3 +10,16 @@ INGREDIENT_NAME_MAX_LENGTH = 128
 INGREDIENT_UNIT_MAX_LENGTH = 64
 INGREDIENT_AMOUNT_MIN = 1
 INGREDIENT_AMOUNT_MAX = 32000
+
+# Единственная строка CatalogVersion
+CATALOG_VERSION_PK = 1
+
+# Варианты изображения рецепта: имя -> максимальные (ширина, высота)
+IMAGE_VARIANTS = {
+    'thumbnail': (240, 240),
+    'card': (640, 640),
+    'full': (1280, 1280),
+}
+IMAGE_VARIANTS_DIR = 'recipes/images/variants'
+IMAGE_JPEG_QUALITY = 85
+IMAGE_WEBP_QUALITY = 80
@@ -0,0 +1,54 @@
+"""Денормализованные счётчики избранного, подписчиков и рецептов."""
+from collections import Counter
+
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+
+def change_counter(model, field, pks):
+    """
+    Изменяет счётчик field у объектов model.
+    pks - словарь {pk: изменение}, например collections.Counter.
+    Объекты с одинаковым изменением обновляются одним запросом.
+    """
+    by_delta = {}
+    for pk, delta in pks.items():
+        if delta:
+            by_delta.setdefault(delta, []).append(pk)
+    for delta, ids in by_delta.items():
+        model.objects.filter(pk__in=ids).update(
+            **{field: Greatest(F(field) + delta, 0)}
+        )
+
+
+def increment(model, field, pk, delta=1):
+    """Изменяет счётчик одного объекта."""
+    change_counter(model, field, Counter({pk: delta}))
+
+
+def count_of(source, lookup):
+    """Выражение: число строк source, ссылающихся на объект по lookup."""
+    return Coalesce(
+        Subquery(
+            source.objects.filter(**{lookup: OuterRef('pk')})
+            .order_by().values(lookup)
+            .annotate(total=Count('pk')).values('total')
+        ),
+        0
+    )
+
+
+def get_counters():
+    """Описание счётчиков: (модель, поле, источник, ссылка на модель)."""
+    from django.contrib.auth import get_user_model
+
+    from users.models import Subscription
+
+    from .models import Favorite, Recipe
+
+    User = get_user_model()
+    return (
+        (Recipe, 'favorites_count', Favorite, 'recipe'),
+        (User, 'subscribers_count', Subscription, 'author'),
+        (User, 'recipes_count', Recipe, 'author'),
+    )
@@ -0,0 +1,134 @@
+"""Фоновая генерация уменьшенных копий картинок рецептов."""
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .constants import (IMAGE_JPEG_QUALITY, IMAGE_VARIANTS, IMAGE_VARIANTS_DIR,
+                        IMAGE_WEBP_QUALITY)
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_PROCESSING_WORKERS,
+            thread_name_prefix='recipe-images'
+        )
+    return _executor
+
+
+def save_variant(image, path, image_format, quality):
+    """Сохраняет копию в хранилище, заменяя существующий файл."""
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, quality=quality, optimize=True)
+    if default_storage.exists(path):
+        default_storage.delete(path)
+    return default_storage.save(path, ContentFile(buffer.getvalue()))
+
+
+def build_variants(image_name):
+    """
+    Создаёт копии картинки по IMAGE_VARIANTS (JPEG и, если включено, WebP).
+    Возвращает словарь {вариант: путь в хранилище}.
+    """
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    with default_storage.open(image_name) as file:
+        original = ImageOps.exif_transpose(Image.open(file))
+        original = original.convert('RGB')
+    variants = {}
+    for name, size in IMAGE_VARIANTS.items():
+        image = original.copy()
+        image.thumbnail(size, Image.LANCZOS)
+        path = f'{IMAGE_VARIANTS_DIR}/{stem}_{name}'
+        variants[name] = save_variant(
+            image, f'{path}.jpg', 'JPEG', IMAGE_JPEG_QUALITY
+        )
+        if settings.IMAGE_WEBP:
+            variants[f'{name}_webp'] = save_variant(
+                image, f'{path}.webp', 'WEBP', IMAGE_WEBP_QUALITY
+            )
+    return variants
+
+
+def process_recipe_image(recipe_id):
+    """Строит копии картинки рецепта и сохраняет пути в image_variants."""
+    from .models import Recipe
+
+    recipe = Recipe.objects.filter(pk=recipe_id).only('image').first()
+    if recipe is None or not recipe.image:
+        return
+    variants = build_variants(recipe.image.name)
+    # Картинку могли заменить, пока шла обработка
+    updated = Recipe.objects.filter(
+        pk=recipe_id, image=recipe.image.name
+    ).update(image_variants=variants, updated_at=timezone.now())
+    if not updated:
+        delete_variants(recipe.image.name, variants)
+
+
+def delete_variants(image_name, variants):
+    """
+    Удаляет копии картинки image_name из хранилища.
+    Копии не трогаются, пока картинкой пользуется какой-либо рецепт:
+    одна картинка может быть у многих рецептов (seed_fake_data).
+    """
+    from .models import Recipe
+
+    if not variants or Recipe.objects.filter(image=image_name).exists():
+        return
+    for path in variants.values():
+        try:
+            default_storage.delete(path)
+        except Exception:
+            logger.exception('Не удалось удалить копию картинки %s', path)
+
+
+def schedule_variants_removal(image_name, variants):
+    """Удаляет копии картинки после коммита транзакции."""
+    if variants:
+        transaction.on_commit(
+            lambda: delete_variants(image_name, variants)
+        )
+
+
+def _run(recipe_id):
+    """Обработка картинки; ошибка пишется в лог, а не поднимается."""
+    try:
+        process_recipe_image(recipe_id)
+    except Exception:
+        logger.exception('Не удалось обработать картинку рецепта %s',
+                         recipe_id)
+
+
+def _run_in_worker(recipe_id):
+    try:
+        _run(recipe_id)
+    finally:
+        close_old_connections()
+
+
+def schedule_recipe_image(recipe_id):
+    """
+    Ставит обработку картинки в очередь после коммита транзакции.
+    При IMAGE_PROCESSING_WORKERS = 0 обработка идёт в текущем потоке;
+    ошибка обработки и тогда не превращает сохранённый рецепт в 500.
+    """
+    def submit():
+        if settings.IMAGE_PROCESSING_WORKERS:
+            get_executor().submit(_run_in_worker, recipe_id)
+        else:
+            _run(recipe_id)
+
+    transaction.on_commit(submit)
@@ -1,52 +1,158 @@
 import csv
+import io
+import json
 import os
+import time
+from itertools import islice
 
 from django.core.management.base import BaseCommand
+from django.db import connection, transaction
 from foodgram_backend.settings import BASE_DIR
 from recipes.models import Ingredient, Tag
+from recipes.signals import catalog_imported
 
+IMPORT_BATCH_SIZE = 1000
 
-def ingredient_create(row):
-    Ingredient.objects.get_or_create(
-        name=row[0],
-        measurement_unit=row[1],
-    )
+# Источник данных: (имя файла без расширения, модель, поля по порядку)
+SOURCES = (
+    ('ingredients', Ingredient, ('name', 'measurement_unit')),
+    ('tags', Tag, ('name', 'slug')),
+)
 
 
-def tag_create(row):
-    """Создаёт тег из строки CSV."""
-    Tag.objects.get_or_create(
-        name=row[0],
-        slug=row[1],
-    )
+def read_csv(file_path, fields):
+    """Построчно читает CSV-файл без заголовка."""
+    with open(file_path, 'r', encoding='utf-8') as file:
+        for row in csv.reader(file):
+            if row:
+                yield tuple(row[:len(fields)])
+
+
+def read_json(file_path, fields):
+    """Читает JSON-файл со списком объектов."""
+    with open(file_path, 'r', encoding='utf-8') as file:
+        for item in json.load(file):
+            yield tuple(item[field] for field in fields)
 
 
-action = {
-    'ingredients.csv': ingredient_create,
-    'tags.csv': tag_create,
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
 }
 
 
+def batches(rows, size):
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+def bulk_insert(model, fields, rows, batch_size):
+    """
+    Вставляет строки пачками, пропуская уже существующие.
+    Возвращает число прочитанных строк.
+    """
+    total = 0
+    for batch in batches(rows, batch_size):
+        model.objects.bulk_create(
+            [model(**dict(zip(fields, row))) for row in batch],
+            ignore_conflicts=True
+        )
+        total += len(batch)
+    return total
+
+
+def copy_insert(model, fields, rows):
+    """
+    Загрузка через COPY во временную таблицу и
+    INSERT ... ON CONFLICT DO NOTHING (только PostgreSQL).
+    Возвращает число прочитанных строк.
+    """
+    quote = connection.ops.quote_name
+    columns = ', '.join(
+        quote(model._meta.get_field(field).column) for field in fields
+    )
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    total = 0
+    for row in rows:
+        writer.writerow(row)
+        total += 1
+    buffer.seek(0)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE TEMP TABLE import_rows ('
+            + ', '.join(f'{quote(field)} text' for field in fields)
+            + ')'
+        )
+        cursor.cursor.copy_expert(
+            'COPY import_rows FROM STDIN WITH (FORMAT csv)', buffer
+        )
+        cursor.execute(
+            f'INSERT INTO {quote(model._meta.db_table)} ({columns}) '
+            f'SELECT {", ".join(quote(field) for field in fields)} '
+            f'FROM import_rows ON CONFLICT DO NOTHING'
+        )
+        cursor.execute('DROP TABLE import_rows')
+    return total
+
+
 class Command(BaseCommand):
-    help = 'Загружает данные из CSV-файлов (ингредиенты и теги).'
+    help = 'Загружает данные из CSV- или JSON-файлов (ингредиенты и теги).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format',
+            choices=READERS,
+            default='csv',
+            help='Формат файлов в каталоге data (по умолчанию csv).'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=IMPORT_BATCH_SIZE,
+            help='Размер пачки для bulk_create.'
+        )
+        parser.add_argument(
+            '--no-copy',
+            action='store_true',
+            help='Не использовать COPY на PostgreSQL.'
+        )
 
     def handle(self, *args, **options):
-        """Загружает все CSV файлы"""
+        """Загружает все файлы одной транзакцией."""
         data_dir = os.path.join(BASE_DIR, 'data')
-        for filename, process_function in action.items():
-            file_path = os.path.join(data_dir, filename)
+        file_format = options['format']
+        use_copy = (
+            connection.vendor == 'postgresql' and not options['no_copy']
+        )
+        with transaction.atomic():
+            for name, model, fields in SOURCES:
+                filename = f'{name}.{file_format}'
+                file_path = os.path.join(data_dir, filename)
 
-            if not os.path.exists(file_path):
-                self.stdout.write(self.style.WARNING(
-                    f"Файл {filename} не найден, пропускаем."
-                ))
-                continue
+                if not os.path.exists(file_path):
+                    self.stdout.write(self.style.WARNING(
+                        f"Файл {filename} не найден, пропускаем."
+                    ))
+                    continue
 
-            with open(file_path, 'r', encoding='utf-8') as file:
-                reader = csv.reader(file)
-                for row in reader:
-                    process_function(row)
+                started = time.perf_counter()
+                count_before = model.objects.count()
+                rows = READERS[file_format](file_path, fields)
+                if use_copy:
+                    total = copy_insert(model, fields, rows)
+                else:
+                    total = bulk_insert(
+                        model, fields, rows, options['batch_size']
+                    )
+                inserted = model.objects.count() - count_before
+                elapsed = time.perf_counter() - started
 
-            self.stdout.write(self.style.SUCCESS(
-                f"Файл {filename} успешно загружен!"
-            ))
+                self.stdout.write(self.style.SUCCESS(
+                    f"Файл {filename} успешно загружен: "
+                    f"строк {total}, добавлено {inserted}, "
+                    f"пропущено {total - inserted}, "
+                    f"{total / elapsed:.0f} строк/с."
+                ))
+        catalog_imported.send(sender=self.__class__)
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.models import ShoppingListItem
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает агрегат списков покупок или проверяет расхождения.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только проверить расхождения, ничего не меняя.'
+        )
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            ShoppingListItem.objects.rebuild()
+            self.stdout.write(self.style.SUCCESS(
+                'Списки покупок пересобраны: '
+                f'{ShoppingListItem.objects.count()} позиций.'
+            ))
+            return
+
+        expected = ShoppingListItem.objects.expected()
+        actual = {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount
+            in ShoppingListItem.objects.values_list(
+                'user_id', 'ingredient_id', 'amount'
+            )
+        }
+        drift = [
+            (key, actual.get(key), expected.get(key))
+            for key in expected.keys() | actual.keys()
+            if actual.get(key) != expected.get(key)
+        ]
+        for (user_id, ingredient_id), stored, computed in sorted(drift):
+            self.stdout.write(
+                f'user={user_id} ingredient={ingredient_id}: '
+                f'в таблице {stored}, по корзинам {computed}'
+            )
+        if drift:
+            raise CommandError(f'Найдено расхождений: {len(drift)}.')
+        self.stdout.write(self.style.SUCCESS('Расхождений нет.'))
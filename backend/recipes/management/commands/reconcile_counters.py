@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from recipes.counters import count_of, get_counters
+
+
+class Command(BaseCommand):
+    help = 'Сверяет денормализованные счётчики с данными и исправляет их.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только показать число расхождений, ничего не меняя.'
+        )
+
+    def handle(self, *args, **options):
+        for model, field, source, lookup in get_counters():
+            actual = count_of(source, lookup)
+            drifted = model.objects.exclude(**{field: actual})
+            if options['check']:
+                fixed = drifted.count()
+            else:
+                fixed = drifted.update(**{field: actual})
+            self.stdout.write(
+                f'{model._meta.model_name}.{field}: '
+                f'расхождений {fixed}'
+            )
+        self.stdout.write(self.style.SUCCESS('Сверка счётчиков завершена.'))
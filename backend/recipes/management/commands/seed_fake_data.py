@@ -0,0 +1,388 @@
+import csv
+import io
+import random
+import time
+from collections import Counter
+from itertools import accumulate, islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from PIL import Image
+
+from recipes.constants import COOKING_TIME_MAX
+from recipes.counters import change_counter
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, ShoppingListItem, Tag)
+from recipes.short_links import to_base62
+from users.models import Subscription
+
+User = get_user_model()
+
+SEED_BATCH_SIZE = 5000
+SEED_PASSWORD = 'foodgram-seed'
+SEED_IMAGE = 'recipes/images/seed.png'
+
+# Показатель степенного закона: чем меньше, тем сильнее перекос
+# популярности авторов и рецептов
+POPULARITY_ALPHA = 1.2
+# Показатель закона Ципфа для частоты ингредиентов и тегов
+ZIPF_EXPONENT = 1.0
+
+FIRST_NAMES = (
+    'Анна', 'Мария', 'Елена', 'Ольга', 'Дарья', 'Ирина', 'Алексей',
+    'Иван', 'Дмитрий', 'Сергей', 'Андрей', 'Михаил', 'Никита', 'Павел',
+)
+LAST_NAMES = (
+    'Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Соколов', 'Лебедев',
+    'Козлов', 'Новиков', 'Морозов', 'Волков', 'Соловьёв', 'Зайцев',
+)
+DISHES = (
+    'Омлет', 'Суп', 'Салат', 'Рагу', 'Плов', 'Пирог', 'Запеканка',
+    'Паста', 'Каша', 'Борщ', 'Оладьи', 'Котлеты', 'Гратен', 'Ризотто',
+)
+STYLES = (
+    'по-домашнему', 'по-деревенски', 'на скорую руку', 'праздничный',
+    'бабушкин', 'острый', 'лёгкий', 'сытный', 'летний', 'зимний',
+)
+STEPS = (
+    'Подготовьте и нарежьте все ингредиенты.',
+    'Разогрейте сковороду с небольшим количеством масла.',
+    'Доведите до кипения и убавьте огонь.',
+    'Перемешайте и оставьте на несколько минут.',
+    'Посолите и поперчите по вкусу.',
+    'Выпекайте в разогретой духовке до золотистой корочки.',
+    'Подавайте горячим, посыпав зеленью.',
+)
+
+
+def batches(items, size):
+    items = iter(items)
+    while batch := list(islice(items, size)):
+        yield batch
+
+
+def power_law_weights(rng, count, alpha=POPULARITY_ALPHA):
+    """Накопленные веса по распределению Парето (для rng.choices)."""
+    return list(accumulate(rng.paretovariate(alpha) for _ in range(count)))
+
+
+def zipf_weights(count, exponent=ZIPF_EXPONENT):
+    """Накопленные веса по закону Ципфа: k-й элемент в k**s раз реже."""
+    return list(accumulate(
+        1 / rank ** exponent for rank in range(1, count + 1)
+    ))
+
+
+def sample_distinct(rng, population, cum_weights, count):
+    """count различных элементов population с учётом весов."""
+    count = min(count, len(population))
+    chosen = set()
+    while len(chosen) < count:
+        chosen.update(rng.choices(
+            population, cum_weights=cum_weights, k=count - len(chosen)
+        ))
+    return chosen
+
+
+def poisson_like(rng, mean):
+    """Неотрицательное целое с экспоненциальным разбросом около mean."""
+    return int(rng.expovariate(1 / mean)) if mean > 0 else 0
+
+
+def ingredient_amount(rng, measurement_unit):
+    if measurement_unit in ('г', 'мл'):
+        return rng.randint(1, 50) * 10
+    if measurement_unit == 'кг':
+        return rng.randint(1, 3)
+    return rng.randint(1, 6)
+
+
+def copy_rows(model, fields, rows):
+    """Вставка строк через COPY (только PostgreSQL)."""
+    quote = connection.ops.quote_name
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    columns = ', '.join(
+        quote(model._meta.get_field(field).column) for field in fields
+    )
+    with connection.cursor() as cursor:
+        cursor.cursor.copy_expert(
+            f'COPY {quote(model._meta.db_table)} ({columns}) '
+            f'FROM STDIN WITH (FORMAT csv)',
+            buffer
+        )
+
+
+def ensure_seed_image():
+    """Одна картинка-заглушка на все созданные рецепты."""
+    if not default_storage.exists(SEED_IMAGE):
+        buffer = io.BytesIO()
+        Image.new('RGB', (640, 480), (230, 190, 140)).save(buffer, 'PNG')
+        default_storage.save(SEED_IMAGE, ContentFile(buffer.getvalue()))
+    return SEED_IMAGE
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет БД синтетическими данными для нагрузочного '
+        'тестирования: пользователи, рецепты, избранное, корзины '
+        'и подписки. Ингредиенты и теги должны быть загружены '
+        'заранее (import_csv).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int, default=1000,
+            help='Число пользователей.'
+        )
+        parser.add_argument(
+            '--recipes', type=int, default=10000,
+            help='Число рецептов.'
+        )
+        parser.add_argument(
+            '--favorites', type=float, default=20,
+            help='Среднее число избранных рецептов на пользователя.'
+        )
+        parser.add_argument(
+            '--carts', type=float, default=3,
+            help='Среднее число рецептов в корзине пользователя.'
+        )
+        parser.add_argument(
+            '--subscriptions', type=float, default=10,
+            help='Среднее число подписок пользователя.'
+        )
+        parser.add_argument(
+            '--ingredients-per-recipe', type=int, default=8,
+            help='Среднее число ингредиентов в рецепте.'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Зерно генератора: одинаковое зерно даёт одинаковые данные.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=SEED_BATCH_SIZE,
+            help='Размер пачки bulk_create и транзакции.'
+        )
+        parser.add_argument(
+            '--prefix', default='seed',
+            help='Префикс username и email создаваемых пользователей.'
+        )
+        parser.add_argument(
+            '--no-copy',
+            action='store_true',
+            help='Не использовать COPY на PostgreSQL.'
+        )
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.rows = Counter()
+        self.use_copy = (
+            connection.vendor == 'postgresql' and not options['no_copy']
+        )
+        ingredients = list(
+            Ingredient.objects.values_list('id', 'measurement_unit')
+        )
+        tag_ids = list(Tag.objects.values_list('id', flat=True))
+        if not ingredients or not tag_ids:
+            raise CommandError(
+                'Нет ингредиентов или тегов: выполните import_csv.'
+            )
+        started = time.perf_counter()
+
+        user_ids = self.create_users(options['users'], options['prefix'])
+        # Популярные авторы и пишут больше, и собирают больше подписчиков
+        author_weights = power_law_weights(self.rng, len(user_ids))
+        recipe_ids = self.create_recipes(
+            options['recipes'], user_ids, author_weights, ingredients,
+            tag_ids, options['ingredients_per_recipe']
+        )
+        self.create_subscriptions(
+            user_ids, author_weights, options['subscriptions']
+        )
+        self.create_relations(
+            Favorite, user_ids, recipe_ids, options['favorites']
+        )
+        self.create_relations(
+            ShoppingCart, user_ids, recipe_ids, options['carts']
+        )
+        for chunk in batches(user_ids, self.batch_size):
+            ShoppingListItem.objects.rebuild(chunk)
+            self.rows['shoppinglistitem'] += ShoppingListItem.objects.filter(
+                user_id__in=chunk
+            ).count()
+
+        elapsed = time.perf_counter() - started
+        total = sum(self.rows.values())
+        for name, count in self.rows.items():
+            self.stdout.write(f'{name}: {count}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано строк: {total} за {elapsed:.1f} с, '
+            f'{total / elapsed:.0f} строк/с.'
+        ))
+
+    def bulk_create(self, model, objects, **kwargs):
+        created = model.objects.bulk_create(
+            objects, batch_size=self.batch_size, **kwargs
+        )
+        self.rows[model._meta.model_name] += len(objects)
+        return created
+
+    def insert(self, model, fields, rows):
+        """
+        Строки связей (кортежи значений fields): COPY на PostgreSQL,
+        иначе bulk_create. Строки уже различны, конфликтов нет.
+        """
+        if self.use_copy:
+            copy_rows(model, fields, rows)
+            self.rows[model._meta.model_name] += len(rows)
+        else:
+            attnames = [
+                model._meta.get_field(field).attname for field in fields
+            ]
+            self.bulk_create(
+                model, [model(**dict(zip(attnames, row))) for row in rows]
+            )
+
+    def update_counters(self, model, field, counts):
+        for chunk in batches(counts.items(), self.batch_size):
+            change_counter(model, field, dict(chunk))
+
+    def create_users(self, count, prefix):
+        """Пользователи с одним заранее вычисленным хешем пароля."""
+        rng = self.rng
+        password = make_password(SEED_PASSWORD, salt=prefix)
+        offset = User.objects.filter(username__startswith=prefix).count()
+        user_ids = []
+        for chunk in batches(range(offset, offset + count), self.batch_size):
+            users = [
+                User(
+                    username=f'{prefix}{number}',
+                    email=f'{prefix}{number}@example.com',
+                    first_name=rng.choice(FIRST_NAMES),
+                    last_name=rng.choice(LAST_NAMES),
+                    password=password,
+                )
+                for number in chunk
+            ]
+            with transaction.atomic():
+                user_ids += [
+                    user.pk for user in self.bulk_create(User, users)
+                ]
+        return user_ids
+
+    def create_recipes(self, count, user_ids, author_weights, ingredients,
+                       tag_ids, ingredients_mean):
+        """
+        Авторы выбираются по степенному закону, ингредиенты и теги -
+        по закону Ципфа в случайном (но детерминированном) порядке.
+        """
+        if not user_ids:
+            return []
+        rng = self.rng
+        image = ensure_seed_image()
+        ingredients = rng.sample(ingredients, len(ingredients))
+        units = dict(ingredients)
+        ingredient_ids = list(units)
+        ingredient_weights = zipf_weights(len(ingredient_ids))
+        tag_ids = rng.sample(tag_ids, len(tag_ids))
+        tag_weights = zipf_weights(len(tag_ids))
+        recipes_count = Counter()
+        recipe_ids = []
+        for chunk in batches(range(count), self.batch_size):
+            recipes = []
+            for _ in chunk:
+                author_id = rng.choices(
+                    user_ids, cum_weights=author_weights
+                )[0]
+                recipes_count[author_id] += 1
+                recipes.append(Recipe(
+                    author_id=author_id,
+                    name=f'{rng.choice(DISHES)} {rng.choice(STYLES)}',
+                    text=' '.join(rng.choices(STEPS, k=rng.randint(2, 6))),
+                    cooking_time=min(
+                        max(int(rng.lognormvariate(3.4, 0.6)), 1),
+                        COOKING_TIME_MAX
+                    ),
+                    image=image,
+                ))
+            with transaction.atomic():
+                self.bulk_create(Recipe, recipes)
+                # Код ссылки выводится из pk, как в Recipe.save
+                for recipe in recipes:
+                    recipe.short_link = to_base62(recipe.pk)
+                Recipe.objects.bulk_update(
+                    recipes, ('short_link',),
+                    batch_size=min(self.batch_size, 1000)
+                )
+                recipe_ingredients, recipe_tags = [], []
+                for recipe in recipes:
+                    size = max(1, round(rng.gauss(ingredients_mean, 3)))
+                    for ingredient_id in sample_distinct(
+                        rng, ingredient_ids, ingredient_weights, size
+                    ):
+                        recipe_ingredients.append((
+                            recipe.pk, ingredient_id,
+                            ingredient_amount(rng, units[ingredient_id])
+                        ))
+                    for tag_id in sample_distinct(
+                        rng, tag_ids, tag_weights, rng.randint(1, 3)
+                    ):
+                        recipe_tags.append((recipe.pk, tag_id))
+                self.insert(
+                    RecipeIngredient,
+                    ('recipe', 'ingredient', 'amount'),
+                    recipe_ingredients
+                )
+                self.insert(
+                    Recipe.tags.through, ('recipe', 'tag'), recipe_tags
+                )
+            recipe_ids += [recipe.pk for recipe in recipes]
+        self.update_counters(User, 'recipes_count', recipes_count)
+        return recipe_ids
+
+    def create_subscriptions(self, user_ids, author_weights, mean):
+        """Граф подписок: популярные авторы получают большинство."""
+        if len(user_ids) < 2:
+            return
+        rng = self.rng
+        subscribers_count = Counter()
+        for chunk in batches(user_ids, self.batch_size):
+            subscriptions = []
+            for user_id in chunk:
+                size = min(poisson_like(rng, mean), len(user_ids) - 1)
+                authors = sample_distinct(
+                    rng, user_ids, author_weights, size + 1
+                )
+                authors.discard(user_id)
+                for author_id in islice(authors, size):
+                    subscribers_count[author_id] += 1
+                    subscriptions.append((user_id, author_id))
+            with transaction.atomic():
+                self.insert(Subscription, ('user', 'author'), subscriptions)
+        self.update_counters(User, 'subscribers_count', subscribers_count)
+
+    def create_relations(self, model, user_ids, recipe_ids, mean):
+        """Избранное или корзины: популярность рецептов - степенной закон."""
+        if not recipe_ids:
+            return
+        rng = self.rng
+        recipe_weights = power_law_weights(rng, len(recipe_ids))
+        counts = Counter()
+        for chunk in batches(user_ids, self.batch_size):
+            relations = []
+            for user_id in chunk:
+                for recipe_id in sample_distinct(
+                    rng, recipe_ids, recipe_weights, poisson_like(rng, mean)
+                ):
+                    counts[recipe_id] += 1
+                    relations.append((user_id, recipe_id))
+            with transaction.atomic():
+                self.insert(model, ('user', 'recipe'), relations)
+        if model is Favorite:
+            self.update_counters(Recipe, 'favorites_count', counts)
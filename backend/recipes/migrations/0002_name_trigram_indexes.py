@@ -0,0 +1,40 @@
+# Generated by Django 4.2.17 on 2026-10-17 10:00
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+TRIGRAM_INDEXES = (
+    ('recipes_ingredient', 'recipes_ingredient_name_trgm'),
+    ('recipes_recipe', 'recipes_recipe_name_trgm'),
+)
+
+
+def create_trigram_indexes(apps, schema_editor):
+    # Индекс по UPPER(name) обслуживает icontains/istartswith,
+    # которые Django компилирует в UPPER(name) LIKE UPPER(...).
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, index in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {index} ON {table} '
+            f'USING gin (UPPER(name) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for _, index in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {index}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0001_initial'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
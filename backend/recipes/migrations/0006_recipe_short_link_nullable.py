@@ -0,0 +1,18 @@
+# Generated by Django 4.2.17 on 2026-10-17 07:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_recipe_favorites_count'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='short_link',
+            field=models.CharField(blank=True, max_length=8, null=True, unique=True, verbose_name='Короткая ссылка'),
+        ),
+    ]
@@ -1,15 +1,16 @@
-from uuid import uuid4
-
 from django.contrib.auth import get_user_model
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Sum
 from django.urls import reverse
+from django.utils import timezone
 
-from .constants import (COOKING_TIME_MAX, COOKING_TIME_MIN,
+from .constants import (CATALOG_VERSION_PK, COOKING_TIME_MAX, COOKING_TIME_MIN,
                         INGREDIENT_AMOUNT_MAX, INGREDIENT_AMOUNT_MIN,
                         INGREDIENT_NAME_MAX_LENGTH, INGREDIENT_UNIT_MAX_LENGTH,
                         RECIPE_NAME_MAX_LENGTH, SHORT_LINK_MAX_LENGTH,
                         STR_REPR_MAX_LENGTH, TAG_FIELDS_MAX_LENGTH)
+from .short_links import to_base62
 
 User = get_user_model()
 
@@ -65,24 +66,66 @@ class Recipe(models.Model):
     short_link = models.CharField(
         max_length=SHORT_LINK_MAX_LENGTH,
         verbose_name="Короткая ссылка",
-        unique=True
+        unique=True,
+        null=True,
+        blank=True
+    )
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Уменьшенные копии картинки'
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        db_index=True,
+        verbose_name='В избранном'
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
     )
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            # Ключ курсорной пагинации ленты рецептов
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='recipe_pub_date_id_idx'
+            ),
+        ]
 
-    def save(self, *args, **kwargs):
-        if not self.short_link:
-            self.short_link = self.generate_unique_short_url()
-        super().save(*args, **kwargs)
+    COUNTER_FIELDS = ('favorites_count',)
+    # Пишет только обработчик картинок (recipes.images) через update()
+    IMAGE_FIELDS = ('image_variants',)
 
-    def generate_unique_short_url(self):
-        while True:
-            short_link = str(uuid4())[:SHORT_LINK_MAX_LENGTH]
-            if not Recipe.objects.filter(short_link=short_link).exists():
-                return short_link
+    def save(self, *args, **kwargs):
+        # Счётчики меняются только через F(), копии картинки - фоновым
+        # обработчиком: объект мог быть загружен раньше, и save()
+        # не должен перезаписывать их устаревшими значениями.
+        if (
+            not self._state.adding
+            and not kwargs.get('force_insert')
+            and kwargs.get('update_fields') is None
+        ):
+            kwargs['update_fields'] = [
+                field.attname for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.COUNTER_FIELDS + self.IMAGE_FIELDS
+            ]
+        if self.short_link:
+            return super().save(*args, **kwargs)
+        # Код ссылки выводится из pk, поэтому назначается после вставки
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.short_link = to_base62(self.pk)
+            Recipe.objects.filter(pk=self.pk).update(
+                short_link=self.short_link
+            )
 
     def get_absolute_url(self):
         return reverse('recipes-detail', kwargs={'pk': self.pk})
@@ -143,6 +186,48 @@ class Ingredient(models.Model):
         return self.name[:STR_REPR_MAX_LENGTH]
 
 
+class CatalogVersionManager(models.Manager):
+    """Единственная строка с версией справочников."""
+
+    def current(self):
+        """Время последнего изменения справочников."""
+        version = self.filter(pk=CATALOG_VERSION_PK).values_list(
+            'updated_at', flat=True
+        ).first()
+        if version is None:
+            version = self.get_or_create(pk=CATALOG_VERSION_PK)[0].updated_at
+        return version
+
+    def bump(self):
+        """Новая версия справочников."""
+        now = timezone.now()
+        if not self.filter(pk=CATALOG_VERSION_PK).update(updated_at=now):
+            self.update_or_create(
+                pk=CATALOG_VERSION_PK, defaults={'updated_at': now}
+            )
+        return now
+
+
+class CatalogVersion(models.Model):
+    """
+    Версия справочников (теги и ингредиенты) для ETag, Last-Modified
+    и снимков. Хранится в БД, поэтому одна для всех процессов.
+    """
+    updated_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Дата изменения справочников'
+    )
+
+    objects = CatalogVersionManager()
+
+    class Meta:
+        verbose_name = 'Версия справочников'
+        verbose_name_plural = 'Версии справочников'
+
+    def __str__(self):
+        return f'{self.updated_at:%Y-%m-%d %H:%M:%S}'
+
+
 class RecipeIngredient(models.Model):
     """Промежуточная модель Recipe и Ingredient."""
     ingredient = models.ForeignKey(
@@ -190,8 +275,8 @@ class RecipeIngredient(models.Model):
 
     def __str__(self):
         return (
-            f'{self.ingredient[:STR_REPR_MAX_LENGTH]} {self.amount}шт. '
-            f'в {self.recipe[:STR_REPR_MAX_LENGTH]}'
+            f'{self.ingredient.name[:STR_REPR_MAX_LENGTH]} {self.amount}шт. '
+            f'в {self.recipe.name[:STR_REPR_MAX_LENGTH]}'
         )
 
 
@@ -240,3 +325,206 @@ class ShoppingCart(BaseUserRecipeRelation):
     class Meta(BaseUserRecipeRelation.Meta):
         verbose_name = 'Список покупок'
         verbose_name_plural = 'Списки покупок'
+
+
+class ShoppingListItemManager(models.Manager):
+    """
+    Поддержание агрегата списка покупок в актуальном состоянии.
+    Методы вызываются сигналами ShoppingCart, RecipeIngredient и
+    Recipe (recipes.signals); вставки в обход сигналов (bulk_create,
+    INSERT ... ON CONFLICT) учитываются вызывающим кодом.
+    """
+
+    def apply_deltas(self, deltas):
+        """
+        Применяет изменения количества.
+        deltas - словарь {(user_id, ingredient_id): изменение}.
+        """
+        deltas = {key: delta for key, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        user_ids = {user_id for user_id, _ in deltas}
+        ingredient_ids = {ingredient_id for _, ingredient_id in deltas}
+        with transaction.atomic():
+            # Блокируются строки пользователей, а не позиций: позиции,
+            # которой ещё нет, не заблокировать, и две параллельные
+            # вставки одной позиции нарушили бы уникальность.
+            # Порядок по pk исключает взаимные блокировки.
+            list(User.objects.select_for_update().filter(
+                pk__in=user_ids
+            ).order_by('pk').values_list('pk', flat=True))
+            existing = {
+                (item.user_id, item.ingredient_id): item
+                for item in self.filter(
+                    user_id__in=user_ids, ingredient_id__in=ingredient_ids
+                )
+            }
+            to_create, to_update, to_delete = [], [], []
+            for (user_id, ingredient_id), delta in deltas.items():
+                item = existing.get((user_id, ingredient_id))
+                if item is None:
+                    if delta > 0:
+                        to_create.append(self.model(
+                            user_id=user_id,
+                            ingredient_id=ingredient_id,
+                            amount=delta
+                        ))
+                    continue
+                item.amount += delta
+                if item.amount > 0:
+                    to_update.append(item)
+                else:
+                    to_delete.append(item.id)
+            self.bulk_create(to_create)
+            self.bulk_update(to_update, ('amount',))
+            if to_delete:
+                self.filter(id__in=to_delete).delete()
+
+    def _recipe_deltas(self, user_ids, recipe_id, sign):
+        amounts = RecipeIngredient.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('ingredient_id', 'amount')
+        return {
+            (user_id, ingredient_id): sign * amount
+            for ingredient_id, amount in amounts
+            for user_id in user_ids
+        }
+
+    def add_recipe(self, user_id, recipe_id):
+        """Добавляет ингредиенты рецепта в список покупок."""
+        self.apply_deltas(self._recipe_deltas((user_id,), recipe_id, 1))
+
+    def remove_recipe(self, user_id, recipe_id):
+        """Убирает ингредиенты рецепта из списка покупок."""
+        self.apply_deltas(self._recipe_deltas((user_id,), recipe_id, -1))
+
+    def remove_carts(self, carts):
+        """
+        Убирает из списков покупок рецепты корзин из queryset carts
+        одним набором изменений (удаление корзин queryset.delete()).
+        """
+        deltas = {}
+        for user_id, ingredient_id, amount in RecipeIngredient.objects.filter(
+            recipe__shoppingcart__in=carts
+        ).values_list('recipe__shoppingcart__user', 'ingredient_id', 'amount'):
+            key = (user_id, ingredient_id)
+            deltas[key] = deltas.get(key, 0) - amount
+        self.apply_deltas(deltas)
+
+    def change_recipes(self, user, recipe_ids, sign):
+        """
+        Добавляет (sign=1) или убирает (sign=-1) ингредиенты
+        нескольких рецептов в списке покупок одним набором изменений.
+        """
+        deltas = {}
+        for ingredient_id, amount in RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list('ingredient_id', 'amount'):
+            key = (user.id, ingredient_id)
+            deltas[key] = deltas.get(key, 0) + sign * amount
+        self.apply_deltas(deltas)
+
+    def remove_recipe_from_all(self, recipe):
+        """Убирает рецепт из списков всех, у кого он в корзине."""
+        user_ids = list(ShoppingCart.objects.filter(
+            recipe=recipe
+        ).values_list('user_id', flat=True))
+        if user_ids:
+            self.apply_deltas(self._recipe_deltas(user_ids, recipe.id, -1))
+
+    def change_recipe(self, recipe, old_amounts, new_amounts):
+        """
+        Учитывает изменение ингредиентов рецепта (объект или id)
+        в корзинах. old_amounts, new_amounts - словари
+        {ingredient_id: количество}.
+        """
+        diff = {
+            ingredient_id: (
+                new_amounts.get(ingredient_id, 0)
+                - old_amounts.get(ingredient_id, 0)
+            )
+            for ingredient_id in old_amounts.keys() | new_amounts.keys()
+        }
+        user_ids = ShoppingCart.objects.filter(
+            recipe=recipe
+        ).values_list('user_id', flat=True)
+        self.apply_deltas({
+            (user_id, ingredient_id): delta
+            for ingredient_id, delta in diff.items()
+            for user_id in user_ids
+        })
+
+    def expected(self, user_ids=None):
+        """Агрегат, вычисленный заново по корзинам."""
+        lookup = {'recipe__shoppingcart__isnull': False}
+        if user_ids is not None:
+            lookup = {'recipe__shoppingcart__user_id__in': user_ids}
+        rows = RecipeIngredient.objects.filter(**lookup).values(
+            'ingredient_id', user_id=F('recipe__shoppingcart__user')
+        ).annotate(total=Sum('amount')).order_by()
+        return {
+            (row['user_id'], row['ingredient_id']): row['total']
+            for row in rows
+        }
+
+    def rebuild(self, user_ids=None):
+        """Пересобирает агрегат с нуля (всех или только user_ids)."""
+        items = self.all()
+        if user_ids is not None:
+            items = items.filter(user_id__in=user_ids)
+        with transaction.atomic():
+            items.delete()
+            self.bulk_create(
+                (
+                    self.model(
+                        user_id=user_id, ingredient_id=ingredient_id,
+                        amount=amount
+                    )
+                    for (user_id, ingredient_id), amount
+                    in self.expected(user_ids).items()
+                ),
+                batch_size=1000
+            )
+
+
+class ShoppingListItem(models.Model):
+    """
+    Суммарное количество ингредиента в списке покупок пользователя.
+    Обновляется сигналами ShoppingCart и RecipeIngredient, в том числе
+    при правке в админке. Расхождение проверяет и исправляет
+    команда rebuild_shopping_lists.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='Ингредиент'
+    )
+    amount = models.PositiveIntegerField(
+        verbose_name='Общее количество'
+    )
+
+    objects = ShoppingListItemManager()
+
+    class Meta:
+        ordering = ('user', 'ingredient')
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Позиции списка покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_shopping_list_item'
+            )
+        ]
+
+    def __str__(self):
+        return (
+            f'{self.ingredient.name[:STR_REPR_MAX_LENGTH]}: {self.amount} '
+            f'{self.ingredient.measurement_unit}'
+        )
@@ -0,0 +1,20 @@
+"""Короткие ссылки на рецепты."""
+BASE62_ALPHABET = (
+    '0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ'
+)
+
+
+def to_base62(number):
+    """
+    Код короткой ссылки для pk рецепта.
+    Коды различны для разных pk, поэтому не требуют проверки
+    уникальности. До pk = 62**7 код короче 8 символов и не совпадает
+    со старыми ссылками (первые 8 символов uuid4).
+    """
+    if number == 0:
+        return BASE62_ALPHABET[0]
+    digits = []
+    while number:
+        number, remainder = divmod(number, len(BASE62_ALPHABET))
+        digits.append(BASE62_ALPHABET[remainder])
+    return ''.join(reversed(digits))
@@ -0,0 +1,128 @@
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import Signal, receiver
+
+from .counters import increment
+from .images import schedule_variants_removal
+from .models import (Favorite, Recipe, RecipeIngredient, ShoppingCart,
+                     ShoppingListItem, User)
+
+# Справочники загружены в обход сигналов моделей (import_csv)
+catalog_imported = Signal()
+
+
+def deleted_directly(model, origin):
+    """
+    Удаляются сами объекты model, а не каскадом от рецепта,
+    пользователя или ингредиента. При каскаде агрегат списков
+    покупок обновляет сигнал рецепта или строки удаляются вместе
+    с пользователем (ингредиентом).
+    """
+    return isinstance(origin, model) or getattr(origin, 'model', None) is model
+
+
+def stored_values(instance, *fields):
+    """Значения полей сохранённого объекта в БД до save(); None для новых."""
+    if instance._state.adding or instance.pk is None:
+        return None
+    return type(instance).objects.filter(
+        pk=instance.pk
+    ).values_list(*fields).first()
+
+
+@receiver(pre_delete, sender=Recipe)
+def remove_recipe_from_shopping_lists(instance, **kwargs):
+    """Убирает удаляемый рецепт из агрегатов списков покупок."""
+    ShoppingListItem.objects.remove_recipe_from_all(instance)
+
+
+@receiver(pre_save, sender=ShoppingCart)
+def remember_shopping_cart(instance, **kwargs):
+    instance._stored = stored_values(instance, 'user_id', 'recipe_id')
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_list(instance, **kwargs):
+    """Добавление в корзину и её правка (например, в админке)."""
+    stored = getattr(instance, '_stored', None)
+    current = (instance.user_id, instance.recipe_id)
+    if stored == current:
+        return
+    if stored is not None:
+        ShoppingListItem.objects.remove_recipe(*stored)
+    ShoppingListItem.objects.add_recipe(*current)
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_from_shopping_list(instance, origin=None, **kwargs):
+    # До удаления: ингредиенты рецепта ещё на месте
+    if not deleted_directly(ShoppingCart, origin):
+        return
+    if isinstance(origin, ShoppingCart):
+        ShoppingListItem.objects.remove_recipe(
+            instance.user_id, instance.recipe_id
+        )
+    elif not getattr(origin, '_shopping_list_updated', False):
+        # queryset.delete(): сигнал приходит на каждую строку,
+        # агрегат обновляется один раз за все корзины queryset
+        origin._shopping_list_updated = True
+        ShoppingListItem.objects.remove_carts(origin)
+
+
+@receiver(pre_save, sender=RecipeIngredient)
+def remember_recipe_ingredient(instance, **kwargs):
+    instance._stored = stored_values(
+        instance, 'recipe_id', 'ingredient_id', 'amount'
+    )
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def change_shopping_lists(instance, **kwargs):
+    """Ингредиент рецепта добавлен или изменён (например, в админке)."""
+    stored = getattr(instance, '_stored', None)
+    if stored is not None and stored[0] != instance.recipe_id:
+        ShoppingListItem.objects.change_recipe(
+            stored[0], {stored[1]: stored[2]}, {}
+        )
+        stored = None
+    old_amounts = {} if stored is None else {stored[1]: stored[2]}
+    new_amounts = {instance.ingredient_id: instance.amount}
+    if old_amounts != new_amounts:
+        ShoppingListItem.objects.change_recipe(
+            instance.recipe_id, old_amounts, new_amounts
+        )
+
+
+@receiver(pre_delete, sender=RecipeIngredient)
+def remove_from_shopping_lists(instance, origin=None, **kwargs):
+    if deleted_directly(RecipeIngredient, origin):
+        ShoppingListItem.objects.change_recipe(
+            instance.recipe_id, {instance.ingredient_id: instance.amount}, {}
+        )
+
+
+@receiver(post_save, sender=Recipe)
+def increment_recipes_count(instance, created, **kwargs):
+    if created:
+        increment(User, 'recipes_count', instance.author_id)
+
+
+@receiver(post_delete, sender=Recipe)
+def decrement_recipes_count(instance, **kwargs):
+    increment(User, 'recipes_count', instance.author_id, -1)
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_image_variants(instance, **kwargs):
+    schedule_variants_removal(instance.image.name, instance.image_variants)
+
+
+@receiver(post_save, sender=Favorite)
+def increment_favorites_count(instance, created, **kwargs):
+    if created:
+        increment(Recipe, 'favorites_count', instance.recipe_id)
+
+
+@receiver(post_delete, sender=Favorite)
+def decrement_favorites_count(instance, **kwargs):
+    increment(Recipe, 'favorites_count', instance.recipe_id, -1)
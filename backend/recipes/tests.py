@@ -0,0 +1,179 @@
+from django.db.models.signals import pre_save
+from django.test import TestCase
+
+from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                     ShoppingCart, ShoppingListItem, User)
+
+
+def create_user(username):
+    return User.objects.create_user(
+        username=username, email=f'{username}@example.com',
+        password='password', first_name=username, last_name=username
+    )
+
+
+class RecipeSaveTests(TestCase):
+
+    def setUp(self):
+        self.author = create_user('author')
+        self.fan = create_user('fan')
+        self.recipe = Recipe.objects.create(
+            author=self.author, name='Борщ', text='Описание',
+            cooking_time=60, image='recipes/images/test.png'
+        )
+
+    def test_save_keeps_favorite_added_during_save(self):
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+
+        def add_favorite(instance, **kwargs):
+            Favorite.objects.create(user=self.fan, recipe=instance)
+
+        pre_save.connect(add_favorite, sender=Recipe)
+        self.addCleanup(pre_save.disconnect, add_favorite, sender=Recipe)
+        recipe.name = 'Борщ зелёный'
+        recipe.save()
+
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.name, 'Борщ зелёный')
+        self.assertEqual(recipe.favorites_count, 1)
+
+    def test_save_keeps_favorite_removed_after_load(self):
+        Favorite.objects.create(user=self.fan, recipe=self.recipe)
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        Favorite.objects.filter(user=self.fan, recipe=self.recipe).delete()
+
+        recipe.save()
+
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.favorites_count, 0)
+
+    def test_save_keeps_variants_stored_after_load(self):
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        variants = {'card': 'recipes/images/variants/test_card.jpg'}
+        Recipe.objects.filter(pk=self.recipe.pk).update(
+            image_variants=variants
+        )
+
+        recipe.save()
+
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_variants, variants)
+
+    def test_new_recipe_gets_short_link(self):
+        self.assertTrue(self.recipe.short_link)
+        self.assertEqual(
+            Recipe.objects.get(pk=self.recipe.pk).short_link,
+            self.recipe.short_link
+        )
+
+
+class ShoppingListSignalsTests(TestCase):
+    """Агрегат списка покупок при правках в обход API (админка, shell)."""
+
+    def setUp(self):
+        self.user = create_user('buyer')
+        author = create_user('cook')
+        self.flour = Ingredient.objects.create(
+            name='мука', measurement_unit='г'
+        )
+        self.milk = Ingredient.objects.create(
+            name='молоко', measurement_unit='мл'
+        )
+        self.pancakes, self.bread = (
+            Recipe.objects.create(
+                author=author, name=name, text='Описание',
+                cooking_time=30, image='recipes/images/test.png'
+            )
+            for name in ('Блины', 'Хлеб')
+        )
+        RecipeIngredient.objects.create(
+            recipe=self.pancakes, ingredient=self.flour, amount=200
+        )
+        RecipeIngredient.objects.create(
+            recipe=self.pancakes, ingredient=self.milk, amount=500
+        )
+        RecipeIngredient.objects.create(
+            recipe=self.bread, ingredient=self.flour, amount=400
+        )
+
+    def assertShoppingList(self, expected):
+        items = dict(
+            ShoppingListItem.objects.filter(user=self.user).values_list(
+                'ingredient__name', 'amount'
+            )
+        )
+        self.assertEqual(items, expected)
+        # Как rebuild_shopping_lists --check: расхождений с корзинами нет
+        self.assertEqual(
+            {
+                (user_id, ingredient_id): amount
+                for user_id, ingredient_id, amount
+                in ShoppingListItem.objects.values_list(
+                    'user_id', 'ingredient_id', 'amount'
+                )
+            },
+            ShoppingListItem.objects.expected()
+        )
+
+    def test_cart_changes(self):
+        cart = ShoppingCart.objects.create(user=self.user, recipe=self.bread)
+        ShoppingCart.objects.create(user=self.user, recipe=self.pancakes)
+        self.assertShoppingList({'мука': 600, 'молоко': 500})
+
+        cart.delete()
+        self.assertShoppingList({'мука': 200, 'молоко': 500})
+
+        ShoppingCart.objects.filter(user=self.user).delete()
+        self.assertShoppingList({})
+
+    def test_carts_deleted_by_queryset(self):
+        other = create_user('neighbour')
+        for user in (self.user, other):
+            ShoppingCart.objects.create(user=user, recipe=self.bread)
+            ShoppingCart.objects.create(user=user, recipe=self.pancakes)
+
+        with self.assertNumQueries(8):
+            ShoppingCart.objects.filter(user=self.user).delete()
+        self.assertShoppingList({})
+        self.assertEqual(
+            ShoppingListItem.objects.filter(user=other).count(), 2
+        )
+
+    def test_cart_recipe_replaced(self):
+        cart = ShoppingCart.objects.create(user=self.user, recipe=self.bread)
+        cart.recipe = self.pancakes
+        cart.save()
+        self.assertShoppingList({'мука': 200, 'молоко': 500})
+
+    def test_recipe_ingredients_changed(self):
+        ShoppingCart.objects.create(user=self.user, recipe=self.pancakes)
+
+        row = RecipeIngredient.objects.get(
+            recipe=self.pancakes, ingredient=self.flour
+        )
+        row.amount = 250
+        row.save()
+        self.assertShoppingList({'мука': 250, 'молоко': 500})
+
+        RecipeIngredient.objects.filter(ingredient=self.milk).delete()
+        self.assertShoppingList({'мука': 250})
+
+        RecipeIngredient.objects.create(
+            recipe=self.pancakes, ingredient=self.milk, amount=300
+        )
+        self.assertShoppingList({'мука': 250, 'молоко': 300})
+
+        row.ingredient = self.milk
+        row.recipe = self.bread
+        row.save()
+        self.assertShoppingList({'молоко': 300})
+
+    def test_recipe_deleted(self):
+        ShoppingCart.objects.create(user=self.user, recipe=self.bread)
+        ShoppingCart.objects.create(user=self.user, recipe=self.pancakes)
+
+        self.bread.delete()
+        self.assertShoppingList({'мука': 200, 'молоко': 500})
+
+        Ingredient.objects.filter(pk=self.milk.pk).delete()
+        self.assertShoppingList({'мука': 200})
@@ -2,6 +2,8 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import Group
 
+from recipes.admin_filters import AuthorUsernameFilter, UsernameFilter
+
 from .models import Subscription, UserModel
 
 
@@ -13,18 +15,19 @@ class UserModelAdmin(UserAdmin):
     list_display = ('id', 'username', 'first_name',
                     'last_name', 'email',
                     'is_superuser', 'subscribers_count')
-    list_filter = ('username', 'email')
+    list_filter = ('is_superuser', 'is_staff', 'is_active')
     search_fields = ('username', 'email', 'first_name', 'last_name')
     ordering = ('-is_superuser', '-is_staff', 'username')
-
-    @admin.display(description='Подписчиков у автора')
-    def subscribers_count(self, obj):
-        return obj.subscribers.count()
+    show_full_result_count = False
 
 
 @admin.register(Subscription)
 class SubscriptionAdmin(admin.ModelAdmin):
     list_display = ('user', 'author')
-    list_filter = ('user', 'author')
+    list_filter = (UsernameFilter, AuthorUsernameFilter)
+    list_select_related = ('user', 'author')
     search_fields = ('user__username', 'author__username')
-    ordering = ('user__username', 'author__username')
+    autocomplete_fields = ('user', 'author')
+    # Порядок по уникальному индексу (user, author), без JOIN
+    ordering = ('user_id', 'author_id')
+    show_full_result_count = False
@@ -38,6 +38,20 @@ class UserModel(AbstractUser):
         null=True,
         verbose_name='Аватар профиля'
     )
+    subscribers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        db_index=True,
+        verbose_name='Количество подписчиков'
+    )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        db_index=True,
+        verbose_name='Количество рецептов'
+    )
+
+    COUNTER_FIELDS = ('subscribers_count', 'recipes_count')
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
@@ -50,6 +64,22 @@ class UserModel(AbstractUser):
     def __str__(self):
         return self.username[:STR_REPR_MAX_LENGTH]
 
+    def save(self, *args, **kwargs):
+        # Счётчики меняются только через F(): объект мог быть загружен
+        # раньше (например, из кеша токенов), и save() не должен
+        # перезаписывать их устаревшими значениями.
+        if (
+            not self._state.adding
+            and not kwargs.get('force_insert')
+            and kwargs.get('update_fields') is None
+        ):
+            kwargs['update_fields'] = [
+                field.attname for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
 
 User = get_user_model()
 
@@ -0,0 +1,17 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.counters import increment
+
+from .models import Subscription, User
+
+
+@receiver(post_save, sender=Subscription)
+def increment_subscribers_count(instance, created, **kwargs):
+    if created:
+        increment(User, 'subscribers_count', instance.author_id)
+
+
+@receiver(post_delete, sender=Subscription)
+def decrement_subscribers_count(instance, **kwargs):
+    increment(User, 'subscribers_count', instance.author_id, -1)